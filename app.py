@@ -4,14 +4,22 @@ Main Flask application for generating certificates from templates and student da
 """
 
 import os
+import secrets
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from flask import Flask, render_template, request, jsonify, send_file, session
-from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 import json
 
-from utils.file_parser import FileParser
+from utils.file_parser import FileParser, merge_students
 from utils.certificate_generator import CertificateGenerator
 from utils.email_sender import EmailSender
+from utils.certificate_index import CertificateIndex
+from utils.upload_stream import receive_multipart, UploadRejected
+from utils.template_preparer import prepare_template
+from utils.render_scheduler import RenderScheduler
+from utils.cohort import Cohort
+from utils.artifact_store import ArtifactStore, ArtifactSweeper
 
 # Load environment variables
 load_dotenv()
@@ -19,26 +27,126 @@ load_dotenv()
 app = Flask(__name__)
 secret_key = os.getenv('FLASK_SECRET_KEY')
 if not secret_key:
-    import secrets
     secret_key = secrets.token_hex(32)
     print("WARNING: FLASK_SECRET_KEY not set in environment. Using generated key for this session.")
 app.config['SECRET_KEY'] = secret_key
 app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
 app.config['CERTIFICATES_FOLDER'] = os.getenv('CERTIFICATES_FOLDER', 'generated_certificates')
 app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
+# Optional print DPI that image templates are downsampled to on upload
+app.config['TEMPLATE_TARGET_DPI'] = int(os.getenv('TEMPLATE_TARGET_DPI') or 0) or None
+# Lifecycle of upload and certificate batches (0 disables a limit)
+app.config['ARTIFACT_TTL_SECONDS'] = int(os.getenv('ARTIFACT_TTL_SECONDS') or 7 * 24 * 3600) or None
+app.config['UPLOAD_QUOTA_BYTES'] = int(os.getenv('UPLOAD_QUOTA_BYTES') or 0) or None
+app.config['CERTIFICATES_QUOTA_BYTES'] = int(os.getenv('CERTIFICATES_QUOTA_BYTES') or 0) or None
+app.config['SWEEP_INTERVAL_SECONDS'] = int(os.getenv('SWEEP_INTERVAL_SECONDS') or 300)
 
 # Create necessary directories
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['CERTIFICATES_FOLDER'], exist_ok=True)
 
+# Parse workers on spawn platforms (macOS, Windows) re-import this module;
+# only the serving process starts worker pools and background threads
+SERVING_PROCESS = multiprocessing.current_process().name == 'MainProcess'
+
+# Worker processes parsing data files, shared by every upload. With fork,
+# start them now, before the sweeper and render threads below exist.
+parse_pool = None
+if SERVING_PROCESS:
+    parse_pool = ProcessPoolExecutor(max_workers=int(os.getenv('PARSE_WORKERS') or 0) or None)
+    if multiprocessing.get_start_method() == 'fork':
+        parse_pool.submit(os.getpid)
+
+# Index of generated certificates, keyed by stable certificate ID
+certificate_index = CertificateIndex(app.config['CERTIFICATES_FOLDER'])
+
+# Every upload and generation gets its own batch directory with a manifest;
+# a background sweeper evicts expired batches and enforces the disk quotas
+upload_store = ArtifactStore(
+    app.config['UPLOAD_FOLDER'],
+    ttl_seconds=app.config['ARTIFACT_TTL_SECONDS'],
+    max_bytes=app.config['UPLOAD_QUOTA_BYTES'],
+    on_evict=lambda manifest, path: certificate_index.remove_owner(manifest['id'])
+)
+certificate_store = ArtifactStore(
+    app.config['CERTIFICATES_FOLDER'],
+    ttl_seconds=app.config['ARTIFACT_TTL_SECONDS'],
+    max_bytes=app.config['CERTIFICATES_QUOTA_BYTES'],
+    on_evict=lambda manifest, path: certificate_index.remove(
+        manifest.get('certificate_ids', []), path
+    )
+)
+artifact_sweeper = ArtifactSweeper(
+    [upload_store, certificate_store],
+    interval_seconds=app.config['SWEEP_INTERVAL_SECONDS']
+) if SERVING_PROCESS else None
+
 # Allowed file extensions
 ALLOWED_TEMPLATE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
 ALLOWED_DATA_EXTENSIONS = {'xlsx', 'xls', 'csv', 'docx'}
+UPLOAD_FIELDS = {
+    'template': ALLOWED_TEMPLATE_EXTENSIONS,
+    'student_data': ALLOWED_DATA_EXTENSIONS,
+}
+
+COHORT_FILENAME = 'cohort.json'
+
+# Queues data files on the parse pool and prepares templates as soon as
+# they finish uploading
+parse_executor = ThreadPoolExecutor(max_workers=4)
+
+# Render workers shared by this process; each session is a tenant with its
+# own concurrency cap
+render_scheduler = RenderScheduler(
+    max_workers=int(os.getenv('RENDER_WORKERS') or 0) or None,
+    tenant_limit=int(os.getenv('RENDER_TENANT_LIMIT') or 0) or None,
+    small_batch_size=int(os.getenv('RENDER_SMALL_BATCH_SIZE') or 100)
+) if SERVING_PROCESS else None
+
+
+def get_upload_batch():
+    """Return the current session's upload batch, or None if it was evicted."""
+    return upload_store.get_batch(session.get('upload_batch'))
+
+
+def load_cohort():
+    """Load the current session's cohort, or None if nothing was uploaded."""
+    batch = get_upload_batch()
+    if batch is None:
+        return None
+
+    cohort_path = os.path.join(batch.path, COHORT_FILENAME)
+    if not os.path.exists(cohort_path):
+        return None
+    return Cohort.load(cohort_path)
+
+
+def touch_certificate_batches(certificates):
+    """Mark the batches holding these certificates as recently used."""
+    for batch_id in {certificate.get('batch') for certificate in certificates}:
+        batch = certificate_store.get_batch(batch_id)
+        if batch is not None:
+            certificate_store.touch(batch)
+
 
+def get_session_certificate(cert_id):
+    """Return a certificate's index entry if it was generated for the current session's upload."""
+    upload_batch = get_upload_batch()
+    if upload_batch is None:
+        return None
 
-def allowed_file(filename, allowed_extensions):
-    """Check if file has an allowed extension."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
+    certificate = certificate_index.get(cert_id, owner=upload_batch.id)
+    if certificate is not None:
+        upload_store.touch(upload_batch)
+        touch_certificate_batches([certificate])
+    return certificate
+
+
+def get_tenant():
+    """Return the scheduling tenant for the current session."""
+    if 'tenant' not in session:
+        session['tenant'] = secrets.token_hex(8)
+    return session['tenant']
 
 
 @app.route('/')
@@ -50,72 +158,161 @@ def index():
 @app.route('/upload', methods=['POST'])
 def upload_files():
     """Handle file uploads for template and student data."""
+    parse_futures = []
+    template_futures = []
+
+    # Each upload lands in its own batch directory, so same-named files
+    # from different uploads never overwrite each other
+    batch = upload_store.create_batch()
+
+    def start_parsing(streamed_file):
+        # Files are processed while the rest of the upload is still arriving
+        if streamed_file.field == 'student_data':
+            parse_futures.append(
+                parse_executor.submit(FileParser().submit_file, streamed_file.path, parse_pool)
+            )
+        elif streamed_file.field == 'template':
+            template_futures.append(
+                parse_executor.submit(
+                    prepare_template,
+                    streamed_file.path,
+                    app.config['TEMPLATE_TARGET_DPI']
+                )
+            )
+
     try:
+        # Stream files to disk, rejecting bad files from their first bytes
+        try:
+            files = receive_multipart(
+                request.stream,
+                request.content_type or '',
+                batch.path,
+                UPLOAD_FIELDS,
+                on_file=start_parsing
+            )
+        except UploadRejected as e:
+            for future in parse_futures + template_futures:
+                future.cancel()
+            upload_store.discard(batch)
+            return jsonify({'error': str(e)}), 400
+
         # Check if files are present
-        if 'template' not in request.files or 'student_data' not in request.files:
+        if 'template' not in files or 'student_data' not in files:
+            upload_store.discard(batch)
             return jsonify({'error': 'Both template and student data files are required'}), 400
 
-        template_file = request.files['template']
-        data_file = request.files['student_data']
-
-        # Validate files
-        if template_file.filename == '' or data_file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-
-        if not allowed_file(template_file.filename, ALLOWED_TEMPLATE_EXTENSIONS):
-            return jsonify({'error': 'Invalid template file format. Allowed: PNG, JPG, JPEG, PDF'}), 400
-
-        if not allowed_file(data_file.filename, ALLOWED_DATA_EXTENSIONS):
-            return jsonify({'error': 'Invalid data file format. Allowed: XLSX, XLS, CSV, DOCX'}), 400
-
-        # Save files
-        template_filename = secure_filename(template_file.filename)
-        data_filename = secure_filename(data_file.filename)
-
-        template_path = os.path.join(app.config['UPLOAD_FOLDER'], template_filename)
-        data_path = os.path.join(app.config['UPLOAD_FOLDER'], data_filename)
-
-        template_file.save(template_path)
-        data_file.save(data_path)
+        template_path = files['template'][0].path
+        prepared_template = template_futures[0].result()
+        data_paths = [streamed_file.path for streamed_file in files['student_data']]
 
-        # Parse student data
-        file_parser = FileParser()
-        students = file_parser.parse_file(data_path)
+        # Merge students from every file and sheet into one cohort
+        students = merge_students(
+            source.result() for future in parse_futures for source in future.result()
+        )
 
         if not students:
+            upload_store.discard(batch)
             return jsonify({'error': 'No valid student data found in the file'}), 400
 
+        # Keep the cohort on disk; the session only holds the batch ID
+        students.save(os.path.join(batch.path, COHORT_FILENAME))
+        upload_store.finalize(batch, kind='upload', student_count=len(students))
+        if upload_store.over_quota():
+            artifact_sweeper.request_sweep()
+
         # Store paths in session
-        session['template_path'] = template_path
-        session['data_path'] = data_path
-        session['students'] = students
+        session['upload_batch'] = batch.id
+        session['original_template_path'] = template_path
+        session['template_path'] = prepared_template['path']
+        session['data_paths'] = data_paths
 
         return jsonify({
             'message': 'Files uploaded successfully',
             'student_count': len(students),
-            'students': students
+            'students': students.to_list(),
+            'template': prepared_template
         }), 200
 
     except Exception as e:
+        upload_store.discard(batch)
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
 
+@app.route('/prepare_template', methods=['POST'])
+def prepare_uploaded_template():
+    """Re-prepare the uploaded template, optionally downsampling to a print DPI."""
+    try:
+        original_template_path = session.get('original_template_path')
+        upload_batch = get_upload_batch()
+        if not original_template_path or upload_batch is None:
+            return jsonify({'error': 'Please upload files first'}), 400
+        upload_store.touch(upload_batch)
+
+        data = request.get_json(silent=True) or {}
+        target_dpi = data.get('target_dpi', app.config['TEMPLATE_TARGET_DPI'])
+        # bool is an int subclass; reject true/false explicitly
+        if target_dpi is not None and (
+            isinstance(target_dpi, bool) or not isinstance(target_dpi, int) or target_dpi <= 0
+        ):
+            return jsonify({'error': 'target_dpi must be a positive integer'}), 400
+
+        prepared_template = prepare_template(original_template_path, target_dpi)
+        session['template_path'] = prepared_template['path']
+
+        return jsonify({
+            'message': 'Template prepared successfully',
+            'template': prepared_template
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Template preparation failed: {str(e)}'}), 500
+
+
 @app.route('/generate', methods=['POST'])
 def generate_certificates():
     """Generate certificates for all students."""
     try:
         template_path = session.get('template_path')
-        students = session.get('students')
+        students = load_cohort()
 
         if not template_path or not students:
             return jsonify({'error': 'Please upload files first'}), 400
 
-        # Generate certificates
-        generator = CertificateGenerator(template_path, app.config['CERTIFICATES_FOLDER'])
-        certificates = generator.generate_certificates(students)
+        upload_batch = get_upload_batch()
+        upload_store.touch(upload_batch)
+
+        # Generate certificates into a fresh batch directory
+        batch = certificate_store.create_batch()
+        try:
+            generator = CertificateGenerator(
+                template_path,
+                batch.path,
+                index=certificate_index,
+                batch_id=batch.id,
+                owner=upload_batch.id
+            )
+            certificates = generator.generate_certificates(
+                students,
+                scheduler=render_scheduler,
+                tenant=get_tenant()
+            )
+        except Exception:
+            certificate_store.discard(batch)
+            raise
+
+        certificate_ids = [certificate['id'] for certificate in certificates]
+        certificate_store.finalize(
+            batch,
+            kind='certificates',
+            upload_batch=upload_batch.id,
+            certificate_ids=sorted(set(certificate_ids))
+        )
+        if certificate_store.over_quota():
+            artifact_sweeper.request_sweep()
 
-        # Store certificate info in session
-        session['certificates'] = certificates
+        # Record each student's certificate ID alongside the cohort
+        students.certificate_ids = certificate_ids
+        students.save(os.path.join(upload_batch.path, COHORT_FILENAME))
 
         return jsonify({
             'message': 'Certificates generated successfully',
@@ -126,19 +323,39 @@ def generate_certificates():
         return jsonify({'error': f'Certificate generation failed: {str(e)}'}), 500
 
 
-@app.route('/preview/<int:index>')
-def preview_certificate(index):
+@app.route('/scheduler_status')
+def scheduler_status():
+    """Report render queue length, running tasks and wait times."""
+    return jsonify(render_scheduler.stats()), 200
+
+
+@app.route('/storage_status')
+def storage_status():
+    """Report disk usage and eviction counts for uploads and certificates."""
+    return jsonify({
+        'uploads': upload_store.stats(),
+        'certificates': certificate_store.stats()
+    }), 200
+
+
+@app.route('/preview/<cert_id>')
+def preview_certificate(cert_id):
     """Preview a specific certificate."""
     try:
-        certificates = session.get('certificates', [])
-        if index < 0 or index >= len(certificates):
-            return jsonify({'error': 'Invalid certificate index'}), 400
+        certificate = get_session_certificate(cert_id)
+        if certificate is None:
+            return jsonify({'error': 'Invalid certificate ID'}), 404
 
-        certificate_path = certificates[index]['path']
+        certificate_path = certificate['path']
         if not os.path.exists(certificate_path):
             return jsonify({'error': 'Certificate file not found'}), 404
 
-        return send_file(certificate_path, mimetype='application/pdf')
+        return send_file(
+            certificate_path,
+            mimetype='application/pdf',
+            etag=certificate['checksum'],
+            conditional=True
+        )
 
     except Exception as e:
         return jsonify({'error': f'Preview failed: {str(e)}'}), 500
@@ -148,28 +365,39 @@ def preview_certificate(index):
 def send_emails():
     """Send certificates via email using Twilio."""
     try:
-        students = session.get('students', [])
-        certificates = session.get('certificates', [])
+        students = load_cohort()
 
-        if not students or not certificates:
+        if not students or not students.certificate_ids:
             return jsonify({'error': 'Please generate certificates first'}), 400
 
         # Get custom message from request
         data = request.get_json()
         custom_message = data.get('message', '')
 
-        # Initialize email sender
+        # Resolve each certificate once; keep its batches from being evicted
+        certificates = {}
+        for cert_id in set(students.certificate_ids):
+            certificate = certificate_index.get(cert_id)
+            if certificate is not None:
+                certificates[cert_id] = certificate
+        upload_store.touch(get_upload_batch())
+        touch_certificate_batches(certificates.values())
+
+        # Initialize email sender and compile the message once for the batch
         email_sender = EmailSender()
+        template = email_sender.compile_template(custom_message)
 
         # Send emails
         results = []
-        for i, (student, certificate) in enumerate(zip(students, certificates)):
+        for student in students:
             if 'email' in student and student['email']:
-                result = email_sender.send_certificate(
+                certificate = certificates.get(student['certificate_id'])
+                result = certificate is not None and email_sender.send_certificate(
                     student['email'],
                     student['name'],
                     certificate['path'],
-                    custom_message
+                    checksum=certificate['checksum'],
+                    template=template
                 )
                 results.append({
                     'student': student['name'],
@@ -192,15 +420,14 @@ def send_emails():
         return jsonify({'error': f'Email sending failed: {str(e)}'}), 500
 
 
-@app.route('/download/<int:index>')
-def download_certificate(index):
+@app.route('/download/<cert_id>')
+def download_certificate(cert_id):
     """Download a specific certificate."""
     try:
-        certificates = session.get('certificates', [])
-        if index < 0 or index >= len(certificates):
-            return jsonify({'error': 'Invalid certificate index'}), 400
+        certificate = get_session_certificate(cert_id)
+        if certificate is None:
+            return jsonify({'error': 'Invalid certificate ID'}), 404
 
-        certificate = certificates[index]
         certificate_path = certificate['path']
         
         if not os.path.exists(certificate_path):
@@ -209,7 +436,9 @@ def download_certificate(index):
         return send_file(
             certificate_path,
             as_attachment=True,
-            download_name=os.path.basename(certificate_path)
+            download_name=certificate['filename'],
+            etag=certificate['checksum'],
+            conditional=True
         )
 
     except Exception as e:
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the certificate generator's data handling.
+"""
+
+import os
+import subprocess
+import sys
+import tracemalloc
+
+from utils.cohort import Cohort
+
+
+def make_students(count):
+    """Build synthetic student dictionaries like the file parser produces."""
+    departments = ['Computer Science', 'Electrical Engineering', 'Mechanical Engineering',
+                   'Civil Engineering', 'Information Technology']
+    return [
+        {
+            'name': f'Student Number {i}',
+            'department': departments[i % len(departments)],
+            'class': str(2020 + i % 5),
+            'email': f'student{i}@example.com',
+            'source': 'students.xlsx:Sheet1',
+        }
+        for i in range(count)
+    ]
+
+
+def measure(build):
+    """Return the bytes still allocated by the object build() returns."""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def bench_cohort_memory(count=100_000):
+    """Compare memory per row of plain dicts and the Cohort container."""
+    print(f"Student storage, {count:,} rows:")
+
+    dict_bytes = measure(lambda: make_students(count))
+    cohort_bytes = measure(lambda: Cohort(make_students(count)))
+
+    print(f"  list of dicts: {dict_bytes / count:8.1f} bytes/row")
+    print(f"  Cohort:        {cohort_bytes / count:8.1f} bytes/row")
+    print(f"  saving:        {1 - cohort_bytes / dict_bytes:8.1%}")
+
+
+# Startup budget for importing the web application, in milliseconds
+IMPORT_BUDGET_MS = int(os.getenv('IMPORT_BUDGET_MS', 400))
+
+# Backends that must not be imported until a request needs them
+LAZY_BACKENDS = ['pandas', 'PIL', 'reportlab', 'PyPDF2', 'docx']
+
+
+def bench_import_time(budget_ms=IMPORT_BUDGET_MS):
+    """Report `python -X importtime` for the app and check it against the budget."""
+    print(f"\nApp import time (budget {budget_ms} ms):")
+
+    check = (
+        "import sys, app; "
+        f"print('eager:' + ','.join(m for m in {LAZY_BACKENDS!r} if m in sys.modules))"
+    )
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', check],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        print(f"  ❌ Importing app failed:\n{process.stderr}")
+        return False
+
+    # Lines look like "import time: self [us] | cumulative | <indent>package",
+    # with two spaces of indent per nesting level; children precede parents
+    total_ms = 0.0
+    children = []
+    app_children = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, package = line[len('import time:'):].split('|')
+        level = (len(package) - len(package.lstrip()) - 1) // 2
+        ms = int(cumulative) / 1000
+        if level == 1:
+            children.append((package.strip(), ms))
+        elif level == 0:
+            if package.strip() == 'app':
+                total_ms, app_children = ms, children
+            children = []
+
+    for package, ms in sorted(app_children, key=lambda item: -item[1])[:10]:
+        print(f"  {package:<30} {ms:8.1f} ms")
+
+    report = [line for line in process.stdout.splitlines() if line.startswith('eager:')]
+    eager = [m for m in report[-1][len('eager:'):].split(',') if m] if report else []
+
+    ok = total_ms <= budget_ms and not eager
+    if eager:
+        print(f"  ❌ Heavy backends imported at startup: {', '.join(eager)}")
+    status = "✓" if total_ms <= budget_ms else "❌"
+    print(f"  {status} app imported in {total_ms:.1f} ms")
+    return ok
+
+
+def main():
+    """Run all benchmarks."""
+    print("=" * 60)
+    print("Certificate Generator Benchmarks")
+    print("=" * 60)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    bench_cohort_memory(count)
+    startup_ok = bench_import_time()
+    return 0 if startup_ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,7 +22,13 @@ sendEmailBtn.addEventListener('click', sendEmails);
 async function handleUpload(e) {
     e.preventDefault();
     
-    const formData = new FormData(uploadForm);
+    // Send student data before the template so the server can start
+    // parsing it while the template is still uploading
+    const formData = new FormData();
+    for (const file of document.getElementById('student_data').files) {
+        formData.append('student_data', file);
+    }
+    formData.append('template', document.getElementById('template').files[0]);
     
     showLoading();
     
@@ -108,7 +114,7 @@ function displayCertificates(certificates) {
     const certificateList = document.getElementById('certificate-list');
     certificateList.innerHTML = '';
     
-    certificates.forEach((cert, index) => {
+    certificates.forEach(cert => {
         const certDiv = document.createElement('div');
         certDiv.className = 'certificate-item';
         certDiv.innerHTML = `
@@ -117,8 +123,8 @@ function displayCertificates(certificates) {
                 <p>${cert.filename}</p>
             </div>
             <div class="certificate-actions">
-                <button class="btn btn-secondary" onclick="previewCertificate(${index})">Preview</button>
-                <button class="btn btn-secondary" onclick="downloadCertificate(${index})">Download</button>
+                <button class="btn btn-secondary" onclick="previewCertificate('${cert.id}')">Preview</button>
+                <button class="btn btn-secondary" onclick="downloadCertificate('${cert.id}')">Download</button>
             </div>
         `;
         certificateList.appendChild(certDiv);
@@ -126,13 +132,13 @@ function displayCertificates(certificates) {
 }
 
 // Preview certificate
-function previewCertificate(index) {
-    window.open(`/preview/${index}`, '_blank');
+function previewCertificate(certId) {
+    window.open(`/preview/${certId}`, '_blank');
 }
 
 // Download certificate
-function downloadCertificate(index) {
-    window.location.href = `/download/${index}`;
+function downloadCertificate(certId) {
+    window.location.href = `/download/${certId}`;
 }
 
 // Send emails
@@ -5,8 +5,19 @@ Simple test script to verify the certificate generator system components.
 
 import os
 import sys
-from utils.file_parser import FileParser
-from utils.email_sender import EmailSender
+import time
+import io
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from utils.file_parser import FileParser, merge_students
+from utils.docx_reader import iter_table_rows, UnsupportedDocxLayout
+from utils.email_sender import EmailSender, EmailTemplate, AttachmentCache
+from utils.certificate_index import CertificateIndex, certificate_id, certificate_filename
+from utils.upload_stream import receive_multipart, sniff_upload, UploadRejected
+from utils.render_scheduler import RenderScheduler
+from utils.cohort import Cohort
+from utils.artifact_store import ArtifactStore
+from utils.template_preparer import normalize_image, downsample_image
 
 def test_file_parser():
     """Test file parser with sample CSV."""
@@ -39,6 +50,151 @@ def test_file_parser():
         print(f"❌ File parser error: {e}")
         return False
 
+def test_parse_files():
+    """Test several files and workbook sheets merge into one de-duplicated cohort."""
+    print("\nTesting Batch Parsing...")
+    try:
+        import pandas as pd
+
+        with tempfile.TemporaryDirectory() as folder:
+            first_csv = os.path.join(folder, 'first.csv')
+            with open(first_csv, 'w') as f:
+                f.write("Name,Department,Class,Email\n"
+                        "John Doe,CS,2023,john@example.com\n"
+                        "Jane Smith,EE,2024,jane@example.com\n")
+            second_csv = os.path.join(folder, 'second.csv')
+            with open(second_csv, 'w') as f:
+                f.write("Name,Department,Class,Email\n"
+                        "john  doe,Physics,2025,JOHN@example.com\n"
+                        "Ravi Kumar,ME,2022,ravi@example.com\n")
+            workbook = os.path.join(folder, 'workbook.xlsx')
+            with pd.ExcelWriter(workbook) as writer:
+                pd.DataFrame({'Name': ['Mia Wong'], 'Email': ['mia@example.com']}).to_excel(
+                    writer, sheet_name='Morning', index=False)
+                pd.DataFrame({'Name': ['Leo Park', 'Jane Smith'],
+                              'Email': ['leo@example.com', 'jane@example.com']}).to_excel(
+                    writer, sheet_name='Evening', index=False)
+                # Sheets without students are skipped, not errors
+                pd.DataFrame().to_excel(writer, sheet_name='Sheet2', index=False)
+                pd.DataFrame({2023: [40], 2024: [42]}).to_excel(
+                    writer, sheet_name='Totals', index=False)
+
+            paths = [first_csv, second_csv, workbook]
+            expected = [
+                ('John Doe', 'CS', 'first.csv'),
+                ('Jane Smith', 'EE', 'first.csv'),
+                ('Ravi Kumar', 'ME', 'second.csv'),
+                ('Mia Wong', 'N/A', 'workbook.xlsx:Morning'),
+                ('Leo Park', 'N/A', 'workbook.xlsx:Evening'),
+            ]
+
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                cohorts = [
+                    FileParser().parse_files(paths),
+                    FileParser().parse_files(paths, max_workers=2),
+                    FileParser().parse_files(paths, executor=pool),
+                ]
+            for students in cohorts:
+                found = [(s['name'], s['department'], s['source']) for s in students]
+                if found != expected:
+                    print(f"❌ Unexpected merged students: {found}")
+                    return False
+            print("✓ Files and sheets merged with duplicates removed and sources tagged")
+
+        merged = merge_students([
+            [{'name': 'Ann  Lee', 'email': 'ANN@example.com', 'source': 'a.csv'}],
+            [{'name': 'ann lee', 'email': 'ann@example.com ', 'source': 'b.csv'},
+             {'name': 'Ann Lee', 'email': 'other@example.com', 'source': 'b.csv'}],
+        ])
+        if [student['source'] for student in merged] != ['a.csv', 'b.csv']:
+            print("❌ merge_students de-duplicated the wrong students")
+            return False
+
+        # Without emails, same-named students in different departments are distinct
+        merged = merge_students([[
+            {'name': 'John Smith', 'department': 'CS', 'class': '2024', 'email': ''},
+            {'name': 'John Smith', 'department': 'EE', 'class': '2024', 'email': ''},
+            {'name': 'john  smith', 'department': 'cs', 'class': '2024', 'email': ''},
+        ]])
+        if [student['department'] for student in merged] != ['CS', 'EE']:
+            print("❌ Same-named students without email were merged")
+            return False
+        print("✓ Duplicates match on normalized name and email; first occurrence wins")
+
+        return True
+    except Exception as e:
+        print(f"❌ Batch parsing error: {e}")
+        return False
+
+def test_docx_reader():
+    """Test the streaming DOCX reader matches python-docx, and falls back when it cannot."""
+    print("\nTesting DOCX Reader...")
+    try:
+        from docx import Document
+
+        parser = FileParser()
+        with tempfile.TemporaryDirectory() as folder:
+            # Two tables, one with a horizontally merged cell
+            doc = Document()
+            for table_number in range(2):
+                table = doc.add_table(rows=1, cols=4)
+                for cell, header in zip(table.rows[0].cells, ['Name', 'Department', 'Class', 'Email']):
+                    cell.text = header
+                for i in range(20):
+                    cells = table.add_row().cells
+                    cells[0].text = f'Student {table_number}-{i}'
+                    cells[1].text = 'Computer Science'
+                    cells[2].text = str(2020 + i % 4)
+                    cells[3].text = f'student{table_number}{i}@example.com'
+            merged = doc.tables[1].rows[5].cells[1].merge(doc.tables[1].rows[5].cells[2])
+            merged.text = 'Physics'
+            simple_path = os.path.join(folder, 'simple.docx')
+            doc.save(simple_path)
+
+            fast = parser._parse_docx_tables_fast(simple_path)
+            if len(fast) != 40 or fast != parser._parse_docx_document(simple_path):
+                print("❌ Streaming reader disagrees with python-docx")
+                return False
+            print("✓ Streaming reader matches python-docx, including merged cells")
+
+            # Vertically merged cells
+            doc = Document()
+            table = doc.add_table(rows=3, cols=2)
+            table.rows[0].cells[0].text, table.rows[0].cells[1].text = 'Name', 'Department'
+            table.cell(1, 0).text, table.cell(2, 0).text = 'Ann', 'Bob'
+            table.cell(1, 1).merge(table.cell(2, 1)).text = 'Mathematics'
+            vmerge_path = os.path.join(folder, 'vmerge.docx')
+            doc.save(vmerge_path)
+
+            # Nested table
+            doc = Document()
+            table = doc.add_table(rows=2, cols=2)
+            table.rows[0].cells[0].text, table.rows[0].cells[1].text = 'Name', 'Department'
+            table.cell(1, 0).text, table.cell(1, 1).text = 'Cleo', 'Biology'
+            table.cell(1, 1).add_table(rows=1, cols=1)
+            nested_path = os.path.join(folder, 'nested.docx')
+            doc.save(nested_path)
+
+            for path in (vmerge_path, nested_path):
+                try:
+                    list(iter_table_rows(path))
+                except UnsupportedDocxLayout:
+                    pass
+                else:
+                    print(f"❌ Streaming reader accepted {os.path.basename(path)}")
+                    return False
+
+                students = parser.parse_file(path)
+                if not students or students != parser._parse_docx_document(path):
+                    print(f"❌ Fallback did not parse {os.path.basename(path)}")
+                    return False
+            print("✓ Merged rows and nested tables fall back to python-docx")
+
+        return True
+    except Exception as e:
+        print(f"❌ DOCX reader error: {e}")
+        return False
+
 def test_email_sender():
     """Test email sender initialization."""
     print("\nTesting Email Sender...")
@@ -56,6 +212,318 @@ def test_email_sender():
         print(f"❌ Email sender error: {e}")
         return False
 
+def test_email_payloads():
+    """Test the email template and the encoded attachment cache."""
+    print("\nTesting Email Payloads...")
+    try:
+        template = EmailTemplate('Use code {CERT} at the desk.')
+        subject, body = template.render('Ana {0}')
+        if subject != 'Certificate of Achievement - Ana {0}':
+            print(f"❌ Wrong subject: {subject}")
+            return False
+        if 'Dear Ana {0},' not in body or 'Use code {CERT} at the desk.' not in body:
+            print("❌ Name or custom message not filled in literally")
+            return False
+        print("✓ Email template fills in names and messages literally")
+
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for i in range(3):
+                path = os.path.join(folder, f'certificate_{i}.pdf')
+                with open(path, 'wb') as f:
+                    f.write(b'%PDF-' + bytes([i]) * 30)
+                paths.append(path)
+
+            cache = AttachmentCache(max_bytes=100)
+            first = cache.get(paths[0], checksum='c0')
+            if cache.get(paths[0], checksum='c0') is not first or (cache.hits, cache.misses) != (1, 1):
+                print("❌ Attachment encoded more than once")
+                return False
+            if first['filename'] != 'certificate_0.pdf' or first['type'] != 'application/pdf':
+                print("❌ Wrong attachment metadata")
+                return False
+
+            # Each encoded attachment is 48 bytes; the third pushes out the least recent
+            cache.get(paths[1], checksum='c1')
+            cache.get(paths[0], checksum='c0')
+            cache.get(paths[2], checksum='c2')
+            if set(cache._entries) != {'c0', 'c2'}:
+                print(f"❌ Wrong attachments evicted: {sorted(cache._entries)}")
+                return False
+        print("✓ Attachments encoded once and evicted least recently used first")
+
+        return True
+    except Exception as e:
+        print(f"❌ Email payload error: {e}")
+        return False
+
+def test_certificate_index():
+    """Test certificate IDs are stable and filenames are safe."""
+    print("\nTesting Certificate Index...")
+    try:
+        student = {'name': 'Ana/Lopez Ñ', 'department': 'CS', 'class': '1', 'email': ''}
+        other = dict(student, department='EE')
+        other_email = dict(student, email='ana@example.com')
+
+        if certificate_id(student, 'abc') != certificate_id(dict(student), 'abc'):
+            print("❌ Certificate ID is not stable")
+            return False
+        if certificate_id(student, 'abc') == certificate_id(other, 'abc'):
+            print("❌ Different certificates share an ID")
+            return False
+        if certificate_id(student, 'abc') != certificate_id(other_email, 'abc'):
+            print("❌ Email address changed the certificate ID")
+            return False
+
+        filename = certificate_filename(certificate_id(student), student['name'])
+        if '/' in filename or not filename.endswith('.pdf'):
+            print(f"❌ Unsafe certificate filename: {filename}")
+            return False
+
+        print("✓ Certificate IDs are stable and filenames are safe")
+
+        with tempfile.TemporaryDirectory() as folder:
+            # Two handles on one folder stand in for two app processes
+            first, second = CertificateIndex(folder), CertificateIndex(folder)
+            first.add({'id': 'a', 'path': os.path.join(folder, 'one', 'a.pdf')})
+            second.add({'id': 'b', 'path': os.path.join(folder, 'two', 'b.pdf')})
+
+            if 'a' not in second or 'b' not in first or len(first) != 2:
+                print("❌ Index entries lost between handles")
+                return False
+
+            first.add({'id': 'c', 'path': os.path.join(folder, 'two', 'c.pdf')}, owner='upload-1')
+            if second.get('c', owner='upload-1') is None or second.get('c', owner='upload-2') is not None:
+                print("❌ Index lookup ignored the owner")
+                return False
+            second.remove_owner('upload-1')
+            if first.get('c', owner='upload-1') is not None:
+                print("❌ Removed owner can still look up its entries")
+                return False
+
+            first.remove(['a', 'b'], os.path.join(folder, 'one'))
+            if 'a' in second or second.get('b') is None:
+                print("❌ Index removed the wrong entries")
+                return False
+
+        print("✓ Index is shared between handles on the same folder")
+        return True
+    except Exception as e:
+        print(f"❌ Certificate index error: {e}")
+        return False
+
+def test_upload_validation():
+    """Test uploads are validated from their first bytes."""
+    print("\nTesting Upload Validation...")
+    try:
+        sniff_upload('students.csv', b'Name,Department\nJohn,CS\n')
+        sniff_upload('template.png', b'\x89PNG\r\n\x1a\n')
+        print("✓ Valid uploads accepted")
+
+        for filename, head in [('students.csv', b'foo,bar\n1,2\n'),
+                               ('students.xlsx', b'not a zip'),
+                               ('template.pdf', b'')]:
+            try:
+                sniff_upload(filename, head)
+            except UploadRejected:
+                continue
+            print(f"❌ Invalid upload accepted: {filename}")
+            return False
+
+        print("✓ Invalid uploads rejected")
+        return True
+    except Exception as e:
+        print(f"❌ Upload validation error: {e}")
+        return False
+
+def test_upload_streaming():
+    """Test same-named files in one upload are stored separately."""
+    print("\nTesting Upload Streaming...")
+    try:
+        boundary = 'testboundary'
+        parts = [
+            ('student_data', 's.csv', b'Name,Email\nAnn,ann@example.com\nBen,ben@example.com\n'),
+            ('student_data', 's.csv', b'Name,Email\nBob,bob@example.com\n'),
+        ]
+        body = b''
+        for field, filename, content in parts:
+            body += (
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                'Content-Type: text/csv\r\n\r\n'
+            ).encode() + content + b'\r\n'
+        body += f'--{boundary}--\r\n'.encode()
+
+        with tempfile.TemporaryDirectory() as folder:
+            files = receive_multipart(
+                io.BytesIO(body),
+                f'multipart/form-data; boundary={boundary}',
+                folder,
+                {'student_data': {'csv'}},
+                chunk_size=16
+            )
+            streamed = files['student_data']
+            contents = []
+            for streamed_file in streamed:
+                with open(streamed_file.path, 'rb') as f:
+                    contents.append(f.read())
+
+            if len({streamed_file.path for streamed_file in streamed}) != 2:
+                print("❌ Same-named uploads share a path")
+                return False
+            if contents != [content for _, _, content in parts]:
+                print("❌ Same-named upload overwritten")
+                return False
+
+        print("✓ Same-named files stored separately")
+        return True
+    except Exception as e:
+        print(f"❌ Upload streaming error: {e}")
+        return False
+
+def test_template_preparer():
+    """Test templates are normalized to embeddable modes and downsampled to A4."""
+    print("\nTesting Template Preparer...")
+    try:
+        from PIL import Image
+
+        translucent = Image.new('RGBA', (4, 4), (255, 0, 0, 255))
+        translucent.putpixel((0, 0), (0, 0, 0, 0))
+        paletted = Image.new('P', (4, 4), 1)
+        paletted.putpalette([0, 0, 0, 0, 0, 255] + [0] * 762)
+        transparent_palette = paletted.copy()
+        transparent_palette.info['transparency'] = 1
+
+        cases = [
+            ('CMYK', Image.new('CMYK', (4, 4), (0, 255, 255, 0)), 'RGB', (255, 0, 0)),
+            ('paletted', paletted, 'RGB', (0, 0, 255)),
+            ('transparent paletted', transparent_palette, 'RGB', (255, 255, 255)),
+            ('16-bit', Image.new('I;16', (4, 4), 65535), 'L', 255),
+            ('opaque RGBA', Image.new('RGBA', (4, 4), (10, 20, 30, 255)), 'RGB', (10, 20, 30)),
+            ('translucent RGBA', translucent, 'RGB', (255, 255, 255)),
+        ]
+        for label, image, mode, pixel in cases:
+            normalized = normalize_image(image)
+            if normalized.mode != mode or normalized.getpixel((0, 0)) != pixel:
+                print(f"❌ {label} normalized to {normalized.mode} {normalized.getpixel((0, 0))}")
+                return False
+
+        rgb = Image.new('RGB', (4, 4))
+        if normalize_image(rgb) is not rgb:
+            print("❌ RGB template was converted needlessly")
+            return False
+        print("✓ CMYK, paletted, 16-bit and alpha templates normalized")
+
+        landscape = downsample_image(Image.new('RGB', (4000, 3000)), 100)
+        portrait = downsample_image(Image.new('RGB', (3000, 4000)), 100)
+        if landscape.width > 1169 or landscape.height > 827 or landscape.width < 1100:
+            print(f"❌ Landscape template downsampled to {landscape.size}")
+            return False
+        if portrait.size != landscape.size[::-1]:
+            print(f"❌ Portrait template downsampled to {portrait.size}")
+            return False
+
+        small = Image.new('RGB', (800, 600))
+        if downsample_image(small, 300) is not small:
+            print("❌ Template below the target DPI was resized")
+            return False
+        print("✓ Templates downsampled to fit A4 at the target DPI")
+
+        return True
+    except Exception as e:
+        print(f"❌ Template preparer error: {e}")
+        return False
+
+def test_render_scheduler():
+    """Test small batches are not stuck behind large ones."""
+    print("\nTesting Render Scheduler...")
+    try:
+        scheduler = RenderScheduler(max_workers=1, small_batch_size=5)
+        finished = []
+
+        def task(tag):
+            def run():
+                time.sleep(0.005)
+                finished.append(tag)
+                return tag
+            return run
+
+        large = scheduler.submit('large', [task('large') for _ in range(40)])
+        small = scheduler.submit('small', [task('small') for _ in range(3)])
+
+        if small.result(timeout=10) != ['small'] * 3:
+            print("❌ Small batch returned wrong results")
+            return False
+        large.result(timeout=10)
+
+        if finished.index('small') > 5:
+            print("❌ Small batch waited behind the large batch")
+            return False
+
+        print("✓ Small batch scheduled ahead of large batch")
+        return True
+    except Exception as e:
+        print(f"❌ Render scheduler error: {e}")
+        return False
+
+def test_cohort():
+    """Test the compact cohort keeps a list-like student API."""
+    print("\nTesting Cohort...")
+    try:
+        students = [
+            {'name': 'John Doe', 'department': 'CS', 'class': '2023', 'email': 'john@example.com'},
+            {'name': 'Jane Smith', 'department': 'CS', 'class': '2024', 'email': ''},
+        ]
+        cohort = Cohort(students)
+
+        if len(cohort) != 2 or cohort[1]['name'] != 'Jane Smith' or cohort[-1]['email'] != '':
+            print("❌ Cohort indexing returned wrong students")
+            return False
+        if [student['department'] for student in cohort] != ['CS', 'CS']:
+            print("❌ Cohort iteration returned wrong students")
+            return False
+        if cohort[0].to_dict()['class'] != '2023':
+            print("❌ Cohort row conversion failed")
+            return False
+
+        print("✓ Cohort supports indexing, iteration and conversion")
+        return True
+    except Exception as e:
+        print(f"❌ Cohort error: {e}")
+        return False
+
+def test_artifact_store():
+    """Test the oldest batches are evicted first when over quota."""
+    print("\nTesting Artifact Store...")
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            store = ArtifactStore(root, max_bytes=150, grace_seconds=0)
+
+            batches = []
+            for i in range(3):
+                batch = store.create_batch()
+                with open(os.path.join(batch.path, 'certificate.pdf'), 'wb') as f:
+                    f.write(b'x' * 100)
+                store.finalize(batch)
+                os.utime(batch.manifest_path, (1000 + i, 1000 + i))
+                batches.append(batch)
+
+            store.sweep()
+            kept = [store.get_batch(batch.id) is not None for batch in batches]
+
+            if kept != [False, False, True]:
+                print(f"❌ Wrong batches evicted: {kept}")
+                return False
+            if store.stats()['evicted_batches'] != 2:
+                print("❌ Eviction count not reported")
+                return False
+
+        print("✓ Oldest batches evicted first")
+        return True
+    except Exception as e:
+        print(f"❌ Artifact store error: {e}")
+        return False
+
 def test_imports():
     """Test that all required packages are importable."""
     print("\nTesting Imports...")
@@ -110,7 +578,17 @@ def main():
         'Imports': test_imports(),
         'Directories': test_directories(),
         'File Parser': test_file_parser(),
+        'Batch Parsing': test_parse_files(),
+        'DOCX Reader': test_docx_reader(),
         'Email Sender': test_email_sender(),
+        'Email Payloads': test_email_payloads(),
+        'Certificate Index': test_certificate_index(),
+        'Upload Validation': test_upload_validation(),
+        'Upload Streaming': test_upload_streaming(),
+        'Template Preparer': test_template_preparer(),
+        'Render Scheduler': test_render_scheduler(),
+        'Cohort': test_cohort(),
+        'Artifact Store': test_artifact_store(),
     }
     
     print("\n" + "=" * 60)
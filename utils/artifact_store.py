@@ -0,0 +1,228 @@
+"""
+Artifact Store Module
+Keeps uploads and generated certificates in per-batch directories with a
+manifest, and evicts old batches in the background by TTL and disk quota.
+"""
+
+import os
+import json
+import time
+import shutil
+import secrets
+import threading
+
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+class ArtifactBatch:
+    """One batch directory inside an ArtifactStore."""
+
+    def __init__(self, store, batch_id):
+        self.store = store
+        self.id = batch_id
+        self.path = os.path.join(store.root, batch_id)
+        self.manifest_path = os.path.join(self.path, MANIFEST_FILENAME)
+
+
+class ArtifactStore:
+    """Per-batch storage under one root folder, with TTL and quota eviction."""
+
+    def __init__(self, root, ttl_seconds=None, max_bytes=None, on_evict=None,
+                 grace_seconds=300):
+        """
+        Create a store.
+
+        Args:
+            root: Folder holding the batch directories
+            ttl_seconds: Evict batches unused for longer than this (None: never)
+            max_bytes: Evict least recently used batches above this size (None: no quota)
+            on_evict: Optional callback receiving each evicted batch's manifest
+                and path
+            grace_seconds: Batches used this recently are never evicted for quota
+        """
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.grace_seconds = grace_seconds
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'bytes': 0,
+            'evicted_batches': 0,
+            'evicted_bytes': 0,
+            'last_sweep_at': None,
+            'last_sweep_seconds': None,
+        }
+
+    def create_batch(self):
+        """Create an empty batch directory and return it."""
+        batch_id = f"{int(time.time() * 1000):013d}-{secrets.token_hex(4)}"
+        batch = ArtifactBatch(self, batch_id)
+        os.makedirs(batch.path)
+        return batch
+
+    def get_batch(self, batch_id):
+        """Return an existing batch by ID, or None if it was evicted."""
+        if not batch_id or os.sep in batch_id or batch_id.startswith('.'):
+            return None
+        batch = ArtifactBatch(self, batch_id)
+        return batch if os.path.isdir(batch.path) else None
+
+    def finalize(self, batch, **extra):
+        """
+        Write a batch's manifest, recording its files and size.
+
+        Args:
+            batch: Batch to finalize
+            **extra: Additional JSON-serializable fields to store in the manifest
+        """
+        files = []
+        size = 0
+        for entry in os.scandir(batch.path):
+            if entry.is_file() and entry.name != MANIFEST_FILENAME:
+                files.append(entry.name)
+                size += entry.stat().st_size
+
+        manifest = {
+            'id': batch.id,
+            'created_at': time.time(),
+            'files': sorted(files),
+            'size': size,
+        }
+        manifest.update(extra)
+
+        tmp_path = f"{batch.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, batch.manifest_path)
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['bytes'] += size
+        return manifest
+
+    def over_quota(self):
+        """Return True if the store is known to be above its disk quota."""
+        with self._lock:
+            return self.max_bytes is not None and self._stats['bytes'] > self.max_bytes
+
+    def touch(self, batch):
+        """Mark a batch as recently used so it is evicted last."""
+        try:
+            os.utime(batch.manifest_path)
+        except FileNotFoundError:
+            pass
+
+    def discard(self, batch):
+        """Delete a batch that will not be finalized (e.g. a rejected upload)."""
+        shutil.rmtree(batch.path, ignore_errors=True)
+
+    def stats(self):
+        """Return disk usage and eviction counters from the latest sweep."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'root': self.root,
+            'ttl_seconds': self.ttl_seconds,
+            'max_bytes': self.max_bytes,
+        })
+        return stats
+
+    def _scan(self):
+        """List (last used, size, manifest, path) for every batch directory."""
+        batches = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+
+            manifest_path = os.path.join(entry.path, MANIFEST_FILENAME)
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                last_used = os.stat(manifest_path).st_mtime
+            except (OSError, ValueError):
+                # Unfinished batch (still being written, or left by a crash)
+                manifest = None
+                last_used = entry.stat().st_mtime
+
+            size = manifest['size'] if manifest else 0
+            batches.append((last_used, size, manifest, entry.path))
+
+        batches.sort(key=lambda batch: batch[0])
+        return batches
+
+    def sweep(self):
+        """Evict expired batches, then least recently used ones over the quota."""
+        started = time.monotonic()
+        now = time.time()
+        batches = self._scan()
+        total = sum(size for _, size, _, _ in batches)
+
+        evicted_batches = 0
+        evicted_bytes = 0
+        remaining = []
+
+        for last_used, size, manifest, path in batches:
+            expired = self.ttl_seconds is not None and now - last_used > self.ttl_seconds
+            over_quota = (
+                self.max_bytes is not None
+                and total > self.max_bytes
+                and now - last_used > self.grace_seconds
+            )
+
+            # Unfinished batches are only removed once they have expired
+            if expired or (over_quota and manifest is not None):
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                evicted_batches += 1
+                evicted_bytes += size
+                if manifest is not None and self.on_evict is not None:
+                    self.on_evict(manifest, path)
+            else:
+                remaining.append(path)
+
+        with self._lock:
+            self._stats.update({
+                'batches': len(remaining),
+                'bytes': total,
+                'evicted_batches': self._stats['evicted_batches'] + evicted_batches,
+                'evicted_bytes': self._stats['evicted_bytes'] + evicted_bytes,
+                'last_sweep_at': now,
+                'last_sweep_seconds': time.monotonic() - started,
+            })
+
+
+class ArtifactSweeper:
+    """Background thread that periodically sweeps artifact stores."""
+
+    def __init__(self, stores, interval_seconds=300):
+        """
+        Start sweeping.
+
+        Args:
+            stores: ArtifactStores to sweep
+            interval_seconds: Seconds between sweeps
+        """
+        self.stores = stores
+        self.interval_seconds = interval_seconds
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='artifact-sweeper', daemon=True)
+        self._thread.start()
+
+    def request_sweep(self):
+        """Ask for a sweep now instead of at the next interval."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            for store in self.stores:
+                try:
+                    store.sweep()
+                except Exception as e:
+                    print(f"Error sweeping {store.root}: {str(e)}")
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
@@ -1,74 +1,131 @@
 """
 Certificate Generator Module
 Generates certificates by overlaying student data on templates.
+
+Pillow, ReportLab and PyPDF2 are imported when a template of their format is
+first rendered, so importing this module stays cheap.
 """
 
 import os
-from PIL import Image, ImageDraw, ImageFont
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.utils import ImageReader
-from PyPDF2 import PdfReader, PdfWriter
 import io
+import threading
+from functools import partial
+
+from utils.certificate_index import (
+    CertificateIndex,
+    certificate_filename,
+    certificate_id,
+    file_checksum,
+)
+from utils.template_preparer import normalize_image
 
 
 class CertificateGenerator:
     """Generate certificates from templates and student data."""
 
-    def __init__(self, template_path, output_folder):
+    def __init__(self, template_path, output_folder, index=None, batch_id=None, owner=None):
         """
         Initialize certificate generator.
         
         Args:
             template_path: Path to certificate template
             output_folder: Folder to save generated certificates
+            index: Optional CertificateIndex to record certificates in
+            batch_id: Optional artifact batch ID recorded with each certificate
+            owner: Optional owner (e.g. upload batch ID) allowed to look the
+                certificates up in the index
         """
         self.template_path = template_path
         self.output_folder = output_folder
+        self.batch_id = batch_id
+        self.owner = owner
         self.template_extension = os.path.splitext(template_path)[1].lower()
+        self.index = index if index is not None else CertificateIndex(output_folder)
+
+        # Decoded template and fonts, loaded once per batch. FreeType fonts
+        # are not shared between render threads, so they are kept per thread.
+        self._template_image = None
+        self._template_pdf = None
+        self._fonts = threading.local()
 
-    def generate_certificates(self, students):
+    def generate_certificates(self, students, scheduler=None, tenant=None):
         """
         Generate certificates for all students.
         
         Args:
             students: List of student dictionaries
+            scheduler: Optional RenderScheduler to run the renders on
+            tenant: Tenant identifier used by the scheduler
             
         Returns:
             List of certificate information dictionaries
         """
-        certificates = []
+        template_checksum = file_checksum(self.template_path)
+
+        # Students with the same printed details render identical certificates
+        unique_students = {}
+        cert_ids = []
+        for student in students:
+            cert_id = certificate_id(student, template_checksum)
+            unique_students.setdefault(cert_id, student)
+            cert_ids.append(cert_id)
+
+        tasks = [
+            partial(self._render_entry, cert_id, student)
+            for cert_id, student in unique_students.items()
+        ]
+        if scheduler is None:
+            rendered = [task() for task in tasks]
+        else:
+            rendered = scheduler.submit(tenant, tasks).result()
+        entries = dict(zip(unique_students, rendered))
 
-        for i, student in enumerate(students):
-            certificate_path = self._generate_single_certificate(student, i)
+        certificates = []
+        for cert_id, student in zip(cert_ids, students):
+            entry = entries[cert_id]
             certificates.append({
+                'id': cert_id,
                 'student_name': student['name'],
-                'path': certificate_path,
-                'filename': os.path.basename(certificate_path)
+                'path': entry['path'],
+                'filename': entry['filename'],
+                'checksum': entry['checksum']
             })
 
+        self.index.add(list(entries.values()), owner=self.owner)
+
         return certificates
 
-    def _generate_single_certificate(self, student, index):
+    def _render_entry(self, cert_id, student):
+        """Render one certificate and build its index entry."""
+        certificate_path = self._generate_single_certificate(student, cert_id)
+        return CertificateIndex.make_entry(cert_id, certificate_path, student, self.batch_id)
+
+    def _generate_single_certificate(self, student, cert_id):
         """Generate a single certificate for a student."""
         if self.template_extension in ['.png', '.jpg', '.jpeg']:
-            return self._generate_from_image(student, index)
+            return self._generate_from_image(student, cert_id)
         elif self.template_extension == '.pdf':
-            return self._generate_from_pdf(student, index)
+            return self._generate_from_pdf(student, cert_id)
         else:
             raise ValueError(f"Unsupported template format: {self.template_extension}")
 
-    def _generate_from_image(self, student, index):
-        """Generate certificate from image template."""
-        # Open template image
-        template = Image.open(self.template_path)
-        
-        # Create a copy to draw on
-        certificate = template.copy()
-        draw = ImageDraw.Draw(certificate)
+    def _load_template_image(self):
+        """Load the image template once, normalized to an embeddable mode."""
+        if self._template_image is None:
+            from PIL import Image
 
-        # Get image dimensions
-        width, height = certificate.size
+            with Image.open(self.template_path) as template:
+                template.load()
+                self._template_image = normalize_image(template)
+        return self._template_image
+
+    def _load_fonts(self):
+        """Load the name and detail fonts once per thread, falling back to the default font."""
+        fonts = getattr(self._fonts, 'fonts', None)
+        if fonts is not None:
+            return fonts
+
+        from PIL import ImageFont
 
         # Try to load a font, fallback to default if not available
         try:
@@ -96,6 +153,24 @@ class CertificateGenerator:
             name_font = ImageFont.load_default()
             detail_font = ImageFont.load_default()
 
+        self._fonts.fonts = (name_font, detail_font)
+        return self._fonts.fonts
+
+    def _generate_from_image(self, student, cert_id):
+        """Generate certificate from image template."""
+        from PIL import ImageDraw
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.utils import ImageReader
+
+        # Create a copy of the normalized template to draw on
+        certificate = self._load_template_image().copy()
+        draw = ImageDraw.Draw(certificate)
+
+        # Get image dimensions
+        width, height = certificate.size
+
+        name_font, detail_font = self._load_fonts()
+
         # Calculate positions (centered)
         # Name position - centered, slightly above middle
         name_text = student['name']
@@ -124,18 +199,15 @@ class CertificateGenerator:
         draw.text((class_x, class_y), class_text, fill='black', font=detail_font)
 
         # Convert to PDF
-        output_filename = f"certificate_{index + 1}_{student['name'].replace(' ', '_')}.pdf"
+        output_filename = certificate_filename(cert_id, student['name'])
         output_path = os.path.join(self.output_folder, output_filename)
 
         # Save as PDF using ReportLab
         pdf_buffer = io.BytesIO()
         c = canvas.Canvas(pdf_buffer, pagesize=(width, height))
         
-        # Convert PIL image to ReportLab ImageReader
-        img_buffer = io.BytesIO()
-        certificate.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        img_reader = ImageReader(img_buffer)
+        # Hand the PIL image to ReportLab directly; no intermediate PNG encode
+        img_reader = ImageReader(certificate)
         
         c.drawImage(img_reader, 0, 0, width, height)
         c.save()
@@ -146,10 +218,16 @@ class CertificateGenerator:
 
         return output_path
 
-    def _generate_from_pdf(self, student, index):
+    def _generate_from_pdf(self, student, cert_id):
         """Generate certificate from PDF template."""
-        # Read the template PDF
-        reader = PdfReader(self.template_path)
+        from reportlab.pdfgen import canvas
+        from PyPDF2 import PdfReader, PdfWriter
+
+        # Read the template PDF from the bytes cached for this batch
+        if self._template_pdf is None:
+            with open(self.template_path, 'rb') as f:
+                self._template_pdf = f.read()
+        reader = PdfReader(io.BytesIO(self._template_pdf))
         writer = PdfWriter()
 
         # Get the first page
@@ -208,7 +286,7 @@ class CertificateGenerator:
             writer.add_page(reader.pages[page_num])
 
         # Write output
-        output_filename = f"certificate_{index + 1}_{student['name'].replace(' ', '_')}.pdf"
+        output_filename = certificate_filename(cert_id, student['name'])
         output_path = os.path.join(self.output_folder, output_filename)
 
         with open(output_path, 'wb') as output_file:
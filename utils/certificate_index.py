@@ -0,0 +1,188 @@
+"""
+Certificate Index Module
+Keeps an on-disk index mapping stable certificate IDs to generated files.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+
+from werkzeug.utils import secure_filename
+
+
+INDEX_FILENAME = 'certificate_index.sqlite3'
+
+
+def file_checksum(file_path, chunk_size=64 * 1024):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def certificate_id(student, template_checksum=''):
+    """
+    Derive a stable certificate ID from the student data and template.
+
+    The same student rendered on the same template always gets the same ID,
+    independent of their position in the uploaded list. Only the fields
+    printed on the certificate count, so a student listed with several
+    email addresses shares one certificate and one email attachment.
+    """
+    digest = hashlib.sha256()
+    digest.update(template_checksum.encode('utf-8'))
+    for field in ('name', 'department', 'class'):
+        digest.update(b'\x00')
+        digest.update(str(student.get(field, '')).strip().encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def certificate_filename(cert_id, student_name):
+    """Build a filesystem-safe output filename for a certificate."""
+    safe_name = secure_filename(student_name) or 'student'
+    return f"certificate_{cert_id}_{safe_name}.pdf"
+
+
+class CertificateIndex:
+    """
+    Map certificate IDs to their path, student, size and checksum.
+
+    Entries live in a SQLite database next to the certificates, so every
+    process serving the app sees the same index, concurrent writers do not
+    lose each other's entries, and lookups read a single row. Each entry can
+    have owners (e.g. upload batches) allowed to look it up.
+    """
+
+    def __init__(self, folder):
+        """
+        Initialize the index for a certificates folder.
+
+        Args:
+            folder: Folder holding generated certificates and the index file
+        """
+        self.folder = folder
+        self.index_path = os.path.join(folder, INDEX_FILENAME)
+        self._local = threading.local()
+
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS certificates ("
+                "id TEXT PRIMARY KEY, path TEXT NOT NULL, entry TEXT NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS certificate_owners ("
+                "cert_id TEXT NOT NULL, owner TEXT NOT NULL, PRIMARY KEY (cert_id, owner))"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS certificate_owners_owner "
+                "ON certificate_owners (owner)"
+            )
+
+    def _connect(self):
+        """Return this thread's connection to the index database."""
+        # Connections must not be shared across threads or forked workers
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.index_path, timeout=30)
+            # WAL lets readers in other processes continue while one writes
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    @staticmethod
+    def make_entry(cert_id, path, student, batch_id=None):
+        """
+        Build an index entry for a generated certificate.
+
+        Args:
+            cert_id: Stable certificate ID
+            path: Path to the generated PDF
+            student: Student dictionary the certificate was rendered for
+            batch_id: Optional ID of the artifact batch holding the file
+
+        Returns:
+            Dictionary with the ID, path, batch, student, size and checksum
+        """
+        return {
+            'id': cert_id,
+            'path': os.path.abspath(path),
+            'filename': os.path.basename(path),
+            'batch': batch_id,
+            'student_name': student['name'],
+            'size': os.path.getsize(path),
+            'checksum': file_checksum(path),
+        }
+
+    def add(self, entries, owner=None):
+        """
+        Record one or more entries in a single transaction.
+
+        Args:
+            entries: Entry dictionary or list of entries
+            owner: Optional owner allowed to look the entries up
+        """
+        if isinstance(entries, dict):
+            entries = [entries]
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO certificates (id, path, entry) VALUES (?, ?, ?)",
+                [(entry['id'], entry['path'], json.dumps(entry)) for entry in entries]
+            )
+            if owner is not None:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO certificate_owners (cert_id, owner) VALUES (?, ?)",
+                    [(entry['id'], owner) for entry in entries]
+                )
+
+    def remove(self, cert_ids, folder):
+        """
+        Drop entries whose file lived in a deleted folder.
+
+        Entries for the same ID that now point elsewhere (a newer batch)
+        are kept.
+        """
+        folder = os.path.join(os.path.abspath(folder), '')
+        with self._connect() as connection:
+            connection.executemany(
+                "DELETE FROM certificates WHERE id = ? AND substr(path, 1, ?) = ?",
+                [(cert_id, len(folder), folder) for cert_id in cert_ids]
+            )
+            connection.executemany(
+                "DELETE FROM certificate_owners WHERE cert_id = ? "
+                "AND NOT EXISTS (SELECT 1 FROM certificates WHERE id = ?)",
+                [(cert_id, cert_id) for cert_id in cert_ids]
+            )
+
+    def remove_owner(self, owner):
+        """Revoke an owner's access to all of its entries."""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM certificate_owners WHERE owner = ?", (owner,))
+
+    def get(self, cert_id, owner=None):
+        """
+        Return the entry for a certificate ID, or None if unknown.
+
+        Args:
+            cert_id: Certificate ID to look up
+            owner: If given, only return the entry if this owner holds it
+        """
+        if owner is None:
+            row = self._connect().execute(
+                "SELECT entry FROM certificates WHERE id = ?", (cert_id,)
+            ).fetchone()
+        else:
+            row = self._connect().execute(
+                "SELECT entry FROM certificates JOIN certificate_owners ON cert_id = id "
+                "WHERE id = ? AND owner = ?", (cert_id, owner)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def __contains__(self, cert_id):
+        return self.get(cert_id) is not None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM certificates").fetchone()[0]
@@ -0,0 +1,163 @@
+"""
+Cohort Module
+Compact, columnar storage for parsed students.
+"""
+
+import json
+from array import array
+
+
+class Student:
+    """A read-only view of one student row in a Cohort."""
+
+    __slots__ = ('_cohort', '_index')
+
+    def __init__(self, cohort, index):
+        self._cohort = cohort
+        self._index = index
+
+    def __getitem__(self, field):
+        try:
+            return self._cohort._get(field, self._index)
+        except KeyError:
+            raise KeyError(field) from None
+
+    def get(self, field, default=None):
+        """Return a field's value, or default if the cohort lacks the field."""
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __contains__(self, field):
+        return field in self._cohort.fields
+
+    def keys(self):
+        return self._cohort.fields
+
+    def to_dict(self):
+        """Return the student as a plain dictionary."""
+        return {field: self[field] for field in self._cohort.fields}
+
+    def __eq__(self, other):
+        if isinstance(other, Student):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self):
+        return f"Student({self.to_dict()!r})"
+
+
+class Cohort:
+    """
+    List-like container of students stored as columns.
+
+    Names and emails are kept as one string list each. Fields whose values
+    repeat a lot (department, class, source) are interned into a shared
+    label table and stored as compact integer codes. Rows are addressed by
+    index and come back as lightweight Student views.
+    """
+
+    # Fields stored as plain strings, one per row
+    TEXT_FIELDS = ('name', 'email')
+    # Fields stored as codes into the interned label table
+    CODED_FIELDS = ('department', 'class', 'source')
+    FIELDS = TEXT_FIELDS + CODED_FIELDS
+
+    def __init__(self, students=()):
+        """
+        Create a cohort.
+
+        Args:
+            students: Optional iterable of student dictionaries
+        """
+        self._text = {field: [] for field in self.TEXT_FIELDS}
+        self._codes = {field: array('I') for field in self.CODED_FIELDS}
+        self._labels = []
+        self._label_codes = {}
+        self.certificate_ids = []
+        self.extend(students)
+
+    @property
+    def fields(self):
+        return self.FIELDS
+
+    def _intern(self, value):
+        """Return the code for a label, adding it to the table if new."""
+        code = self._label_codes.get(value)
+        if code is None:
+            code = len(self._labels)
+            self._labels.append(value)
+            self._label_codes[value] = code
+        return code
+
+    def _get(self, field, index):
+        if field in self._text:
+            return self._text[field][index]
+        if field in self._codes:
+            return self._labels[self._codes[field][index]]
+        if field == 'certificate_id' and self.certificate_ids:
+            return self.certificate_ids[index]
+        raise KeyError(field)
+
+    def append(self, student):
+        """Add a student dictionary (or Student view) to the cohort."""
+        for field in self.TEXT_FIELDS:
+            self._text[field].append(str(student.get(field, '')))
+        for field in self.CODED_FIELDS:
+            self._codes[field].append(self._intern(str(student.get(field, ''))))
+
+    def extend(self, students):
+        """Add several students to the cohort."""
+        for student in students:
+            self.append(student)
+
+    def __len__(self):
+        return len(self._text['name'])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Cohort index out of range")
+        return Student(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Student(self, index)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def to_list(self):
+        """Return the students as a list of plain dictionaries."""
+        return [student.to_dict() for student in self]
+
+    def save(self, path):
+        """Write the cohort to a JSON file in its columnar form."""
+        data = {
+            'text': self._text,
+            'codes': {field: codes.tolist() for field, codes in self._codes.items()},
+            'labels': self._labels,
+            'certificate_ids': self.certificate_ids,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        """Read a cohort written by save()."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        cohort = cls()
+        cohort._text = {field: data['text'][field] for field in cls.TEXT_FIELDS}
+        cohort._codes = {
+            field: array('I', data['codes'][field]) for field in cls.CODED_FIELDS
+        }
+        cohort._labels = data['labels']
+        cohort._label_codes = {label: code for code, label in enumerate(cohort._labels)}
+        cohort.certificate_ids = data.get('certificate_ids', [])
+        return cohort
@@ -0,0 +1,99 @@
+"""
+DOCX Table Reader Module
+Streams table rows straight out of a DOCX file's document XML, without
+building the python-docx object model.
+"""
+
+import zipfile
+import xml.etree.ElementTree as ET
+
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DOCUMENT_PART = 'word/document.xml'
+
+_TBL = f'{WORD_NAMESPACE}tbl'
+_TR = f'{WORD_NAMESPACE}tr'
+_TC = f'{WORD_NAMESPACE}tc'
+_P = f'{WORD_NAMESPACE}p'
+_T = f'{WORD_NAMESPACE}t'
+_TAB = f'{WORD_NAMESPACE}tab'
+_GRID_SPAN = f'{WORD_NAMESPACE}gridSpan'
+_V_MERGE = f'{WORD_NAMESPACE}vMerge'
+_VAL = f'{WORD_NAMESPACE}val'
+
+
+class UnsupportedDocxLayout(Exception):
+    """Raised when a document uses a table layout the fast reader does not handle."""
+
+
+def _cell_text(cell):
+    """Return the text of a table cell, one line per paragraph."""
+    lines = []
+    for paragraph in cell.iter(_P):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == _T and node.text:
+                parts.append(node.text)
+            elif node.tag == _TAB:
+                parts.append('\t')
+        lines.append(''.join(parts))
+    return '\n'.join(lines)
+
+
+def _cell_span(cell):
+    """Return how many grid columns a cell spans."""
+    properties = cell.find(f'{WORD_NAMESPACE}tcPr')
+    if properties is None:
+        return 1
+
+    if properties.find(_V_MERGE) is not None:
+        raise UnsupportedDocxLayout("Vertically merged cells")
+
+    grid_span = properties.find(_GRID_SPAN)
+    if grid_span is None:
+        return 1
+    return int(grid_span.get(_VAL, 1))
+
+
+def iter_table_rows(file_path):
+    """
+    Stream the rows of every top-level table in a DOCX file.
+
+    Horizontally merged cells are repeated once per grid column they span,
+    matching python-docx's ``row.cells``.
+
+    Args:
+        file_path: Path to the DOCX file
+
+    Yields:
+        Tuples of (table number, list of cell texts)
+
+    Raises:
+        UnsupportedDocxLayout: If the document has nested tables or
+            vertically merged cells
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(DOCUMENT_PART) as document:
+            table_depth = 0
+            table_number = -1
+
+            for event, element in ET.iterparse(document, events=('start', 'end')):
+                if element.tag == _TBL:
+                    if event == 'start':
+                        table_depth += 1
+                        if table_depth > 1:
+                            raise UnsupportedDocxLayout("Nested tables")
+                        table_number += 1
+                    else:
+                        table_depth -= 1
+                        element.clear()
+                elif event == 'end' and element.tag == _P and table_depth == 0:
+                    element.clear()
+                elif event == 'end' and element.tag == _TR:
+                    cells = []
+                    for cell in element.iterfind(_TC):
+                        cells.extend([_cell_text(cell)] * _cell_span(cell))
+                    yield table_number, cells
+
+                    # Drop the parsed row so memory stays flat on long tables
+                    element.clear()
@@ -4,28 +4,162 @@ Sends certificates via email using Twilio SendGrid API.
 
 Note: Current implementation simulates email sending for demonstration purposes.
 To enable actual email sending, install the sendgrid package and uncomment
-the SendGrid integration code in the send_certificate method.
+the SendGrid integration code in the _deliver method.
 
 Required package: pip install sendgrid
-Environment variable: SENDGRID_API_KEY
+Environment variable: SENDGRID_API_KEY (app.py loads it from .env)
 """
 
 import os
-from dotenv import load_dotenv
 import base64
+import threading
+from collections import OrderedDict
 
-load_dotenv()
+from utils.certificate_index import file_checksum
+
+
+# Default email body; {student_name} and {custom_message} are filled in
+EMAIL_BODY_TEMPLATE = """
+Dear {student_name},
+
+Congratulations on your achievement! Please find your certificate attached to this email.
+
+{custom_message}
+
+This certificate recognizes your dedication and accomplishments. We are proud of your success!
+
+Best regards,
+Certificate Generation Team
+"""
+
+EMAIL_SUBJECT_TEMPLATE = "Certificate of Achievement - {student_name}"
+
+
+class EmailTemplate:
+    """Subject and body compiled once per batch, with the custom message filled in."""
+
+    def __init__(self, custom_message=''):
+        """
+        Compile the email template.
+
+        Args:
+            custom_message: Custom message to include in every email
+        """
+        self.custom_message = custom_message
+
+        # Split around the name so rendering is plain concatenation and the
+        # custom message is never re-formatted
+        marker = '\x00student_name\x00'
+        body = EMAIL_BODY_TEMPLATE.format(student_name=marker, custom_message=custom_message)
+        subject = EMAIL_SUBJECT_TEMPLATE.format(student_name=marker)
+        self._body_parts = body.split(marker)
+        self._subject_parts = subject.split(marker)
+
+    def render(self, student_name):
+        """Return the (subject, body) for a student."""
+        return (
+            student_name.join(self._subject_parts),
+            student_name.join(self._body_parts),
+        )
+
+
+class AttachmentCache:
+    """Base64-encoded certificate attachments, keyed by certificate checksum."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        Create the cache.
+
+        Args:
+            max_bytes: Maximum total size of cached encoded attachments
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, certificate_path, checksum=None):
+        """
+        Return the encoded attachment for a certificate, encoding it at most once.
+
+        Args:
+            certificate_path: Path to certificate PDF
+            checksum: Certificate checksum from the index (computed if omitted)
+
+        Returns:
+            Dictionary with base64 'content', 'filename' and 'type'
+        """
+        if checksum is None:
+            checksum = file_checksum(certificate_path)
+
+        with self._lock:
+            attachment = self._entries.get(checksum)
+            if attachment is not None:
+                self._entries.move_to_end(checksum)
+                self.hits += 1
+                return attachment
+            self.misses += 1
+
+        # Read and encode the certificate outside the lock
+        with open(certificate_path, 'rb') as f:
+            certificate_data = f.read()
+        attachment = {
+            'content': base64.b64encode(certificate_data).decode('utf-8'),
+            'filename': os.path.basename(certificate_path),
+            'type': 'application/pdf',
+        }
+
+        with self._lock:
+            if checksum not in self._entries:
+                self._entries[checksum] = attachment
+                self._size += len(attachment['content'])
+                while self._size > self.max_bytes and len(self._entries) > 1:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted['content'])
+        return attachment
+
+
+# Shared across senders so re-sent batches reuse encoded attachments. Built
+# on first use so EMAIL_ATTACHMENT_CACHE_BYTES can come from app.py's .env.
+_attachment_cache = None
+_attachment_cache_lock = threading.Lock()
+
+
+def get_attachment_cache():
+    """Return the shared attachment cache, creating it on first use."""
+    global _attachment_cache
+    with _attachment_cache_lock:
+        if _attachment_cache is None:
+            _attachment_cache = AttachmentCache(
+                max_bytes=int(os.getenv('EMAIL_ATTACHMENT_CACHE_BYTES') or 64 * 1024 * 1024)
+            )
+        return _attachment_cache
+
+
+def split_addresses(to_email):
+    """Split a recipient field holding one or more addresses (comma or semicolon separated)."""
+    return [address.strip() for address in to_email.replace(';', ',').split(',') if address.strip()]
 
 
 class EmailSender:
     """Send certificates via email using Twilio SendGrid."""
 
-    def __init__(self):
-        """Initialize email sender with Twilio/SendGrid credentials."""
+    def __init__(self, max_retries=None):
+        """
+        Initialize email sender with Twilio/SendGrid credentials.
+
+        Args:
+            max_retries: Extra delivery attempts per recipient (default: EMAIL_MAX_RETRIES or 2)
+        """
         self.account_sid = os.getenv('TWILIO_ACCOUNT_SID')
         self.auth_token = os.getenv('TWILIO_AUTH_TOKEN')
         self.from_email = os.getenv('TWILIO_FROM_EMAIL')
         self.sendgrid_api_key = os.getenv('SENDGRID_API_KEY')
+        if max_retries is None:
+            max_retries = int(os.getenv('EMAIL_MAX_RETRIES', 2))
+        self.max_retries = max_retries
 
         # Allow initialization without credentials for demo mode
         if not all([self.from_email]):
@@ -34,99 +168,115 @@ class EmailSender:
         else:
             self.simulation_mode = False
 
-    def send_certificate(self, to_email, student_name, certificate_path, custom_message=''):
+    def compile_template(self, custom_message=''):
+        """Compile the subject/body template once for a batch."""
+        return EmailTemplate(custom_message)
+
+    def send_certificate(self, to_email, student_name, certificate_path, custom_message='',
+                         checksum=None, template=None):
         """
         Send certificate via email.
         
+        The attachment is encoded once per certificate and shared by every
+        recipient and retry.
+        
         Args:
-            to_email: Recipient email address
+            to_email: Recipient email address (several may be separated by commas or semicolons)
             student_name: Name of the student
             certificate_path: Path to certificate PDF
-            custom_message: Custom message to include in email
+            custom_message: Custom message to include in email (ignored if template is given)
+            checksum: Certificate checksum from the index, used as the cache key
+            template: EmailTemplate compiled for the batch
             
         Returns:
             Boolean indicating success or failure
         """
         try:
-            # Prepare email subject
-            subject = f"Certificate of Achievement - {student_name}"
+            if template is None:
+                template = self.compile_template(custom_message)
 
-            # Prepare email body
-            default_message = f"""
-Dear {student_name},
+            # Prepare email subject and body
+            subject, body = template.render(student_name)
 
-Congratulations on your achievement! Please find your certificate attached to this email.
+            # Encoded certificate, shared across recipients, retries and batches
+            attachment = get_attachment_cache().get(certificate_path, checksum)
 
-{custom_message}
-
-This certificate recognizes your dedication and accomplishments. We are proud of your success!
-
-Best regards,
-Certificate Generation Team
-"""
-
-            # Read certificate file
-            with open(certificate_path, 'rb') as f:
-                certificate_data = f.read()
-
-            # Encode certificate as base64
-            certificate_b64 = base64.b64encode(certificate_data).decode('utf-8')
-
-            if self.simulation_mode or not self.sendgrid_api_key:
-                # Simulation mode - log the email that would be sent
-                print(f"[SIMULATION] Email to: {to_email}")
-                print(f"[SIMULATION] Subject: {subject}")
-                print(f"[SIMULATION] Attachment: {os.path.basename(certificate_path)}")
-                return True
-            
-            # Real implementation with SendGrid (requires sendgrid package)
-            # Uncomment this section and install sendgrid package to enable actual email sending
-            #
-            # from sendgrid import SendGridAPIClient
-            # from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
-            # 
-            # message = Mail(
-            #     from_email=self.from_email,
-            #     to_emails=to_email,
-            #     subject=subject,
-            #     plain_text_content=default_message
-            # )
-            # 
-            # attachment = Attachment(
-            #     FileContent(certificate_b64),
-            #     FileName(os.path.basename(certificate_path)),
-            #     FileType('application/pdf'),
-            #     Disposition('attachment')
-            # )
-            # message.attachment = attachment
-            # 
-            # sg = SendGridAPIClient(self.sendgrid_api_key)
-            # response = sg.send(message)
-            # return response.status_code in [200, 201, 202]
-            
-            return True
+            sent = True
+            for address in split_addresses(to_email):
+                sent = self._deliver_with_retries(address, subject, body, attachment) and sent
+            return sent
 
         except Exception as e:
             print(f"Error sending email to {to_email}: {str(e)}")
             return False
 
-    def send_bulk_certificates(self, recipients):
+    def _deliver_with_retries(self, to_email, subject, body, attachment):
+        """Deliver a prepared message, retrying failed attempts."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._deliver(to_email, subject, body, attachment):
+                    return True
+            except Exception as e:
+                print(f"Error sending email to {to_email} (attempt {attempt + 1}): {str(e)}")
+        return False
+
+    def _deliver(self, to_email, subject, body, attachment):
+        """Send one prepared message to one recipient."""
+        if self.simulation_mode or not self.sendgrid_api_key:
+            # Simulation mode - log the email that would be sent
+            print(f"[SIMULATION] Email to: {to_email}")
+            print(f"[SIMULATION] Subject: {subject}")
+            print(f"[SIMULATION] Attachment: {attachment['filename']}")
+            return True
+        
+        # Real implementation with SendGrid (requires sendgrid package)
+        # Uncomment this section and install sendgrid package to enable actual email sending
+        #
+        # from sendgrid import SendGridAPIClient
+        # from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
+        # 
+        # message = Mail(
+        #     from_email=self.from_email,
+        #     to_emails=to_email,
+        #     subject=subject,
+        #     plain_text_content=body
+        # )
+        # 
+        # message.attachment = Attachment(
+        #     FileContent(attachment['content']),
+        #     FileName(attachment['filename']),
+        #     FileType(attachment['type']),
+        #     Disposition('attachment')
+        # )
+        # 
+        # sg = SendGridAPIClient(self.sendgrid_api_key)
+        # response = sg.send(message)
+        # return response.status_code in [200, 201, 202]
+        
+        return True
+
+    def send_bulk_certificates(self, recipients, custom_message=''):
         """
         Send certificates to multiple recipients.
         
         Args:
             recipients: List of dictionaries with 'email', 'name', 'certificate_path'
+                and optionally 'checksum'
+            custom_message: Custom message to include in every email
             
         Returns:
             Dictionary with success and failure counts
         """
         results = {'success': 0, 'failed': 0}
+        template = self.compile_template(custom_message)
 
         for recipient in recipients:
             success = self.send_certificate(
                 recipient['email'],
                 recipient['name'],
-                recipient['certificate_path']
+                recipient['certificate_path'],
+                checksum=recipient.get('checksum'),
+                template=template
             )
             
             if success:
@@ -2,17 +2,151 @@
 File Parser Module
 Handles parsing of different file formats (Excel, CSV, DOC, DOCX)
 to extract student information.
+
+pandas and python-docx are imported on first use of their format, so
+importing this module stays cheap.
 """
 
-import pandas as pd
 import csv
-from docx import Document
 import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import xml.etree.ElementTree as ET
+
+from utils.docx_reader import iter_table_rows, UnsupportedDocxLayout
+from utils.cohort import Cohort
+
+
+def _parse_source(file_path, sheet_name=None):
+    """Parse one file or workbook sheet and tag each student with its source."""
+    parser = FileParser()
+    source = os.path.basename(file_path)
+
+    if sheet_name is not None:
+        students = parser._parse_excel(file_path, sheet_name=sheet_name)
+        source = f"{source}:{sheet_name}"
+    else:
+        students = parser.parse_file(file_path)
+
+    for student in students:
+        student['source'] = source
+    return students
+
+
+def _student_key(student):
+    """
+    Return the de-duplication key for a student.
+
+    Students with an email match on normalized name and email. Without an
+    email, department and class are compared too, so two different students
+    who share a name are both kept.
+    """
+    name = ' '.join(student['name'].split()).casefold()
+    email = student.get('email', '').strip().casefold()
+    if email:
+        return name, email
+    return (
+        name,
+        '',
+        str(student.get('department', '')).strip().casefold(),
+        str(student.get('class', '')).strip().casefold(),
+    )
+
+
+def merge_students(results):
+    """
+    Merge per-source student lists into one Cohort.
+
+    Students are de-duplicated by normalized name and email (name,
+    department and class when there is no email); the first occurrence
+    wins and input order is preserved.
+    """
+    students = Cohort()
+    seen = set()
+    for source_students in results:
+        for student in source_students:
+            key = _student_key(student)
+            if key not in seen:
+                seen.add(key)
+                students.append(student)
+    return students
 
 
 class FileParser:
     """Parse student data from various file formats."""
 
+    # Accepted column names for each standard field
+    NAME_FIELDS = ['name', 'student_name', 'student name', 'full_name', 'full name', 'studentname']
+    DEPT_FIELDS = ['department', 'dept', 'branch', 'stream', 'course']
+    CLASS_FIELDS = ['class', 'year', 'semester', 'grade', 'level', 'section']
+    EMAIL_FIELDS = ['email', 'email_address', 'email address', 'mail', 'e-mail']
+
+    def parse_files(self, file_paths, max_workers=None, executor=None):
+        """
+        Parse student data from several files into one cohort.
+        
+        Every sheet of an Excel workbook is parsed, not just the first one.
+        Files and sheets are parsed concurrently in a process pool, and
+        students are de-duplicated as in merge_students().
+        
+        Args:
+            file_paths: Paths to the uploaded files
+            max_workers: Maximum number of worker processes (default: CPU count)
+            executor: Optional long-lived process pool to parse on instead of
+                starting one for this call
+            
+        Returns:
+            Cohort of students, each with a 'source' field naming the file
+            (and sheet) it came from
+        """
+        if executor is not None:
+            futures = []
+            for file_path in file_paths:
+                futures.extend(self.submit_file(file_path, executor))
+            return merge_students(future.result() for future in futures)
+
+        sources = []
+        for file_path in file_paths:
+            sources.extend(self._list_sources(file_path))
+
+        workers = min(max_workers or os.cpu_count() or 1, len(sources))
+        if workers <= 1:
+            results = [_parse_source(*source) for source in sources]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_source, *zip(*sources)))
+
+        return merge_students(results)
+
+    def submit_file(self, file_path, executor):
+        """
+        Queue every source of a file (the file, or each workbook sheet) on a process pool.
+
+        Args:
+            file_path: Path to the uploaded file
+            executor: Process pool to parse on
+
+        Returns:
+            List of futures, one per source, each resolving to that source's
+            list of students; pass their results to merge_students()
+        """
+        return [executor.submit(_parse_source, *source) for source in self._list_sources(file_path)]
+
+    def _list_sources(self, file_path):
+        """List the (file path, sheet name) units of work for a file."""
+        file_extension = os.path.splitext(file_path)[1].lower()
+
+        if file_extension in ['.xlsx', '.xls']:
+            try:
+                import pandas as pd
+
+                with pd.ExcelFile(file_path) as workbook:
+                    return [(file_path, sheet) for sheet in workbook.sheet_names]
+            except Exception as e:
+                raise Exception(f"Error parsing Excel file: {str(e)}")
+
+        return [(file_path, None)]
+
     def parse_file(self, file_path):
         """
         Parse student data from uploaded file.
@@ -34,10 +168,12 @@ class FileParser:
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
 
-    def _parse_excel(self, file_path):
-        """Parse Excel file."""
+    def _parse_excel(self, file_path, sheet_name=0):
+        """Parse one sheet of an Excel file (the first sheet by default)."""
         try:
-            df = pd.read_excel(file_path)
+            import pandas as pd
+
+            df = pd.read_excel(file_path, sheet_name=sheet_name)
             return self._normalize_dataframe(df)
         except Exception as e:
             raise Exception(f"Error parsing Excel file: {str(e)}")
@@ -45,6 +181,8 @@ class FileParser:
     def _parse_csv(self, file_path):
         """Parse CSV file."""
         try:
+            import pandas as pd
+
             df = pd.read_csv(file_path)
             return self._normalize_dataframe(df)
         except Exception as e:
@@ -56,7 +194,22 @@ class FileParser:
         if file_extension == '.doc':
             raise ValueError("Legacy .doc files are not supported. Please convert to .docx format.")
         
+        # Fast path: stream table rows straight from the document XML
         try:
+            students = self._parse_docx_tables_fast(file_path)
+            if students:
+                return students
+        except (UnsupportedDocxLayout, zipfile.BadZipFile, KeyError, ET.ParseError):
+            pass
+
+        # Fall back to the python-docx object model for unusual layouts
+        return self._parse_docx_document(file_path)
+
+    def _parse_docx_document(self, file_path):
+        """Parse DOCX tables (or paragraphs) through the python-docx object model."""
+        try:
+            from docx import Document
+
             doc = Document(file_path)
             students = []
 
@@ -72,7 +225,9 @@ class FileParser:
                             student_data[headers[i]] = cell.text.strip()
                     
                     if student_data:
-                        students.append(self._normalize_student_data(student_data))
+                        normalized = self._normalize_student_data(student_data)
+                        if normalized:
+                            students.append(normalized)
 
             # If no tables found, try to parse from paragraphs
             if not students:
@@ -82,6 +237,30 @@ class FileParser:
         except Exception as e:
             raise Exception(f"Error parsing DOCX file: {str(e)}")
 
+    def _parse_docx_tables_fast(self, file_path):
+        """Parse DOCX tables by streaming rows from the document XML."""
+        students = []
+        headers = None
+        current_table = None
+
+        for table_number, cells in iter_table_rows(file_path):
+            # Assume first row of each table is header
+            if table_number != current_table:
+                current_table = table_number
+                headers = [text.strip().lower() for text in cells]
+                continue
+
+            student_data = {}
+            for header, text in zip(headers, cells):
+                student_data[header] = text.strip()
+
+            if student_data:
+                normalized = self._normalize_student_data(student_data)
+                if normalized:
+                    students.append(normalized)
+
+        return students
+
     def _parse_docx_paragraphs(self, doc):
         """Parse DOCX paragraphs looking for student data."""
         students = []
@@ -111,7 +290,11 @@ class FileParser:
         students = []
         
         # Convert column names to lowercase for easier matching
-        df.columns = df.columns.str.lower().str.strip()
+        df.columns = df.columns.astype(str).str.lower().str.strip()
+
+        # Skip blank sheets and sheets without a name column (e.g. totals)
+        if df.empty or not set(df.columns).intersection(self.NAME_FIELDS):
+            return students
 
         for _, row in df.iterrows():
             student_data = row.to_dict()
@@ -128,32 +311,26 @@ class FileParser:
         """
         normalized = {}
 
-        # Map various field names to standard names
-        name_fields = ['name', 'student_name', 'student name', 'full_name', 'full name', 'studentname']
-        dept_fields = ['department', 'dept', 'branch', 'stream', 'course']
-        class_fields = ['class', 'year', 'semester', 'grade', 'level', 'section']
-        email_fields = ['email', 'email_address', 'email address', 'mail', 'e-mail']
-
         # Extract name
-        for field in name_fields:
+        for field in self.NAME_FIELDS:
             if field in data and data[field]:
                 normalized['name'] = str(data[field]).strip()
                 break
 
         # Extract department
-        for field in dept_fields:
+        for field in self.DEPT_FIELDS:
             if field in data and data[field]:
                 normalized['department'] = str(data[field]).strip()
                 break
 
         # Extract class
-        for field in class_fields:
+        for field in self.CLASS_FIELDS:
             if field in data and data[field]:
                 normalized['class'] = str(data[field]).strip()
                 break
 
         # Extract email
-        for field in email_fields:
+        for field in self.EMAIL_FIELDS:
             if field in data and data[field]:
                 normalized['email'] = str(data[field]).strip()
                 break
@@ -0,0 +1,197 @@
+"""
+Render Scheduler Module
+Runs certificate rendering on a shared worker pool with per-tenant limits
+and fair round-robin scheduling between batches.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class RenderBatch:
+    """A group of render tasks submitted together by one tenant."""
+
+    def __init__(self, tenant, tasks):
+        """
+        Create a batch.
+
+        Args:
+            tenant: Identifier of the tenant (session) submitting the batch
+            tasks: List of zero-argument callables
+        """
+        self.tenant = tenant
+        self.size = len(tasks)
+        self.pending = deque(enumerate(tasks))
+        self.results = [None] * self.size
+        self.running = 0
+        self.completed = 0
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self._done = threading.Event()
+        if not tasks:
+            self._done.set()
+
+    @property
+    def wait_time(self):
+        """Seconds the batch waited before its first task started."""
+        started_at = self.started_at if self.started_at is not None else time.monotonic()
+        return started_at - self.submitted_at
+
+    def done(self):
+        """Return True once every task has finished or the batch failed."""
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Wait for the batch and return task results in submission order.
+
+        Raises:
+            TimeoutError: If the batch is not finished within timeout
+            Exception: The first exception raised by a task
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("Render batch did not finish in time")
+        if self.error is not None:
+            raise self.error
+        return self.results
+
+
+class RenderScheduler:
+    """
+    Schedule render batches fairly across a worker budget.
+
+    The budget and tenant limit hold within one process; every server
+    process running the app has its own scheduler.
+    """
+
+    def __init__(self, max_workers=None, tenant_limit=None, small_batch_size=100):
+        """
+        Start the scheduler's worker threads.
+
+        Args:
+            max_workers: Number of render workers in this process (default: CPU count)
+            tenant_limit: Maximum tasks running at once for one tenant
+                (default: all workers)
+            small_batch_size: Batches up to this size are served before
+                larger ones
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.tenant_limit = tenant_limit or self.max_workers
+        self.small_batch_size = small_batch_size
+
+        self._condition = threading.Condition()
+        self._small_batches = deque()
+        self._large_batches = deque()
+        self._running = defaultdict(int)
+        self._recent_waits = deque(maxlen=100)
+        self._completed_batches = 0
+
+        for i in range(self.max_workers):
+            worker = threading.Thread(
+                target=self._work, name=f"render-worker-{i}", daemon=True
+            )
+            worker.start()
+
+    def submit(self, tenant, tasks):
+        """
+        Queue a batch of render tasks.
+
+        Args:
+            tenant: Identifier of the tenant (session) submitting the batch
+            tasks: List of zero-argument callables
+
+        Returns:
+            RenderBatch whose result() yields the task results in order
+        """
+        batch = RenderBatch(tenant, list(tasks))
+        if batch.size == 0:
+            return batch
+
+        with self._condition:
+            if batch.size <= self.small_batch_size:
+                self._small_batches.append(batch)
+            else:
+                self._large_batches.append(batch)
+            self._condition.notify_all()
+        return batch
+
+    def stats(self):
+        """Return queue length, running tasks and recent wait times."""
+        with self._condition:
+            queued = list(self._small_batches) + list(self._large_batches)
+            waits = list(self._recent_waits)
+            waiting = [batch.wait_time for batch in queued if batch.started_at is None]
+
+            return {
+                'workers': self.max_workers,
+                'tenant_limit': self.tenant_limit,
+                'queued_batches': len(queued),
+                'queued_tasks': sum(len(batch.pending) for batch in queued),
+                'running_tasks': sum(self._running.values()),
+                'running_by_tenant': dict(self._running),
+                'completed_batches': self._completed_batches,
+                'avg_wait_seconds': sum(waits) / len(waits) if waits else 0.0,
+                'max_wait_seconds': max(waits + waiting, default=0.0),
+                'oldest_waiting_seconds': max(waiting, default=0.0),
+            }
+
+    def _next_task(self):
+        """Pick the next task, round-robin over batches, small batches first."""
+        for lane in (self._small_batches, self._large_batches):
+            for _ in range(len(lane)):
+                batch = lane[0]
+                lane.rotate(-1)
+                if self._running.get(batch.tenant, 0) >= self.tenant_limit:
+                    continue
+
+                position, task = batch.pending.popleft()
+                if not batch.pending:
+                    lane.remove(batch)
+                return batch, position, task
+        return None
+
+    def _work(self):
+        """Worker loop: run tasks as the scheduler hands them out."""
+        while True:
+            with self._condition:
+                picked = self._next_task()
+                while picked is None:
+                    self._condition.wait()
+                    picked = self._next_task()
+
+                batch, position, task = picked
+                if batch.started_at is None:
+                    batch.started_at = time.monotonic()
+                    self._recent_waits.append(batch.wait_time)
+                batch.running += 1
+                self._running[batch.tenant] += 1
+
+            try:
+                result, error = task(), None
+            except Exception as e:
+                result, error = None, e
+
+            with self._condition:
+                batch.running -= 1
+                batch.completed += 1
+                self._running[batch.tenant] -= 1
+                if not self._running[batch.tenant]:
+                    del self._running[batch.tenant]
+                batch.results[position] = result
+
+                if error is not None and batch.error is None:
+                    # Fail fast: drop the rest of the batch
+                    batch.error = error
+                    batch.pending.clear()
+                    for lane in (self._small_batches, self._large_batches):
+                        if batch in lane:
+                            lane.remove(batch)
+
+                if not batch.pending and batch.running == 0:
+                    self._completed_batches += 1
+                    batch._done.set()
+
+                self._condition.notify_all()
@@ -0,0 +1,145 @@
+"""
+Template Preparer Module
+Normalizes uploaded certificate templates once, so every certificate in a
+batch starts from a template that is cheap to copy and embed.
+"""
+
+import os
+
+
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg']
+
+# Printable area used when downsampling to a target DPI (A4, in inches)
+PRINT_SIZE_INCHES = (11.69, 8.27)
+
+
+def normalize_image(image):
+    """
+    Convert an image to 8-bit RGB or L, the modes ReportLab embeds directly.
+
+    CMYK, paletted and 16-bit images are converted, opaque alpha channels are
+    dropped, and real transparency is flattened onto a white background.
+    """
+    from PIL import Image
+
+    if image.mode.startswith('I;16') or image.mode == 'I':
+        # Scale 16-bit greyscale down to 8 bits
+        image = image.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+    elif image.mode in ('1', 'F'):
+        image = image.convert('L')
+    elif image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    elif image.mode in ('CMYK', 'YCbCr', 'LAB', 'HSV', 'RGBX'):
+        image = image.convert('RGB')
+
+    if image.mode in ('RGBA', 'LA', 'PA'):
+        alpha = image.getchannel('A')
+        base_mode = 'L' if image.mode == 'LA' else 'RGB'
+        if alpha.getextrema() == (255, 255):
+            image = image.convert(base_mode)
+        else:
+            background = Image.new(base_mode, image.size, 'white')
+            background.paste(image.convert(base_mode), mask=alpha)
+            image = background
+
+    return image
+
+
+def downsample_image(image, target_dpi):
+    """Shrink an image so it prints on A4 at no more than target_dpi."""
+    from PIL import Image
+
+    max_width = int(max(PRINT_SIZE_INCHES) * target_dpi)
+    max_height = int(min(PRINT_SIZE_INCHES) * target_dpi)
+    if image.width < image.height:
+        max_width, max_height = max_height, max_width
+
+    scale = min(max_width / image.width, max_height / image.height)
+    if scale >= 1:
+        return image
+
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS)
+
+
+def prepared_path(template_path, extension):
+    """Return the path a prepared template is stored at."""
+    stem = os.path.splitext(template_path)[0]
+    return f"{stem}.prepared{extension}"
+
+
+def prepare_template(template_path, target_dpi=None):
+    """
+    Prepare a template for fast rendering.
+
+    Image templates are normalized to 8-bit RGB/L without alpha and
+    optionally downsampled; PDF templates are rewritten with compressed
+    content streams. Images that need no changes are used as-is.
+
+    Args:
+        template_path: Path to the uploaded template
+        target_dpi: Optional print DPI to downsample image templates to
+
+    Returns:
+        Dictionary describing the prepared template, including its 'path'
+    """
+    extension = os.path.splitext(template_path)[1].lower()
+
+    if extension in IMAGE_EXTENSIONS:
+        return _prepare_image(template_path, target_dpi)
+    elif extension == '.pdf':
+        return _prepare_pdf(template_path)
+    else:
+        raise ValueError(f"Unsupported template format: {extension}")
+
+
+def _prepare_image(template_path, target_dpi):
+    """Normalize an image template and store it as PNG when it changed."""
+    from PIL import Image
+
+    with Image.open(template_path) as original:
+        original_mode = original.mode
+        original_size = original.size
+
+        image = normalize_image(original)
+        if target_dpi:
+            image = downsample_image(image, target_dpi)
+
+        if image is original:
+            # Already in its final form; nothing to store
+            path = template_path
+        else:
+            path = prepared_path(template_path, '.png')
+            image.save(path, format='PNG')
+
+        return {
+            'path': path,
+            'original_mode': original_mode,
+            'original_size': list(original_size),
+            'mode': image.mode,
+            'size': list(image.size),
+        }
+
+
+def _prepare_pdf(template_path):
+    """Rewrite a PDF template with compressed content streams."""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(template_path)
+    writer = PdfWriter()
+
+    for page in reader.pages:
+        writer.add_page(page)
+    for page in writer.pages:
+        page.compress_content_streams()
+
+    path = prepared_path(template_path, '.pdf')
+    with open(path, 'wb') as output_file:
+        writer.write(output_file)
+
+    first_page = reader.pages[0].mediabox
+    return {
+        'path': path,
+        'pages': len(reader.pages),
+        'size': [float(first_page.width), float(first_page.height)],
+    }
@@ -0,0 +1,229 @@
+"""
+Upload Stream Module
+Streams multipart uploads straight to disk, validating each file from its
+first bytes so bad uploads are rejected before the whole body arrives.
+"""
+
+import os
+import csv
+import io
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import (
+    MultipartDecoder,
+    NEED_DATA,
+    Data,
+    Epilogue,
+    File,
+)
+from werkzeug.utils import secure_filename
+
+from utils.file_parser import FileParser
+
+
+# Bytes buffered from the start of each file before it is validated
+SNIFF_BYTES = 64 * 1024
+
+# Magic numbers identifying each accepted file format
+FILE_SIGNATURES = {
+    'png': [b'\x89PNG\r\n\x1a\n'],
+    'jpg': [b'\xff\xd8\xff'],
+    'jpeg': [b'\xff\xd8\xff'],
+    'pdf': [b'%PDF-'],
+    'xlsx': [b'PK\x03\x04'],
+    'docx': [b'PK\x03\x04'],
+    'xls': [b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'],
+}
+
+
+class UploadRejected(Exception):
+    """Raised when an upload is invalid and should be refused."""
+
+
+def _extension(filename):
+    """Return the lowercase extension of a filename, without the dot."""
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def sniff_upload(filename, head):
+    """
+    Validate an uploaded file from its first bytes.
+
+    Binary formats are checked against their magic number. CSV files must
+    have a header row containing one of the accepted name columns.
+
+    Args:
+        filename: Name of the uploaded file
+        head: First bytes of the file (up to SNIFF_BYTES)
+
+    Raises:
+        UploadRejected: If the file does not look like its extension claims
+    """
+    extension = _extension(filename)
+
+    if not head:
+        raise UploadRejected(f"{filename} is empty")
+
+    if extension in FILE_SIGNATURES:
+        if not any(head.startswith(magic) for magic in FILE_SIGNATURES[extension]):
+            raise UploadRejected(f"{filename} is not a valid .{extension} file")
+        return
+
+    if extension == 'csv':
+        if b'\x00' in head:
+            raise UploadRejected(f"{filename} is not a text CSV file")
+
+        text = head.decode('utf-8-sig', errors='replace')
+        header = next(csv.reader(io.StringIO(text)), [])
+        columns = {column.strip().lower() for column in header}
+        if not columns.intersection(FileParser.NAME_FIELDS):
+            raise UploadRejected(
+                f"{filename} has no name column. Expected one of: "
+                f"{', '.join(FileParser.NAME_FIELDS)}"
+            )
+
+
+class StreamedFile:
+    """A multipart file part written to disk as it arrives."""
+
+    def __init__(self, field, filename, path):
+        """
+        Open the destination file for an incoming part.
+
+        Args:
+            field: Form field name of the part
+            filename: Client-supplied filename
+            path: Destination path on disk
+        """
+        self.field = field
+        self.filename = filename
+        self.path = path
+        self._file = open(path, 'wb')
+        self._head = bytearray()
+        self._sniffed = False
+
+    def write(self, data):
+        """Append a chunk, validating the file once enough bytes are buffered."""
+        if not self._sniffed:
+            self._head.extend(data[:SNIFF_BYTES - len(self._head)])
+            if len(self._head) >= SNIFF_BYTES:
+                self._sniff()
+        self._file.write(data)
+
+    def finish(self):
+        """Close the file, validating it if it was shorter than SNIFF_BYTES."""
+        self._file.close()
+        if not self._sniffed:
+            self._sniff()
+
+    def discard(self):
+        """Close and delete a partially received file."""
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _sniff(self):
+        self._sniffed = True
+        sniff_upload(self.filename, bytes(self._head))
+        self._head = None
+
+
+def _unique_filename(destination, filename, used):
+    """Return filename, suffixed if the request or the folder already has it."""
+    stem, extension = os.path.splitext(filename)
+    candidate = filename
+    counter = 1
+    while candidate in used or os.path.exists(os.path.join(destination, candidate)):
+        counter += 1
+        candidate = f"{stem}_{counter}{extension}"
+    used.add(candidate)
+    return candidate
+
+
+def receive_multipart(stream, content_type, destination, allowed_extensions,
+                      on_file=None, chunk_size=64 * 1024):
+    """
+    Stream a multipart/form-data body to disk, file by file.
+
+    Each file part is written directly to ``destination`` in chunks and
+    validated from its first bytes. Parts sharing a filename are stored
+    under distinct names (``students.csv``, ``students_2.csv``, ...). ``on_file`` is called as soon as a part
+    is complete, while later parts are still being received, so callers can
+    start processing early.
+
+    Args:
+        stream: Readable request body stream
+        content_type: Request Content-Type header
+        destination: Folder to write uploaded files to
+        allowed_extensions: Mapping of form field name to allowed extensions
+        on_file: Optional callback receiving each completed StreamedFile
+        chunk_size: Number of bytes read from the stream at a time
+
+    Returns:
+        Dictionary mapping field names to lists of completed StreamedFile
+
+    Raises:
+        UploadRejected: If a part is missing a filename, has a disallowed
+            extension, or fails validation
+    """
+    mimetype, options = parse_options_header(content_type)
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise UploadRejected("Expected a multipart/form-data upload")
+
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    files = {}
+    used_filenames = set()
+    current = None
+
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            decoder.receive_data(chunk or None)
+
+            event = decoder.next_event()
+            while event is not NEED_DATA and not isinstance(event, Epilogue):
+                if isinstance(event, File):
+                    if event.name not in allowed_extensions:
+                        raise UploadRejected(f"Unexpected file field: {event.name}")
+                    if not event.filename:
+                        raise UploadRejected("No file selected")
+
+                    extension = _extension(event.filename)
+                    allowed = allowed_extensions[event.name]
+                    if extension not in allowed:
+                        raise UploadRejected(
+                            f"Invalid {event.name} file format. "
+                            f"Allowed: {', '.join(sorted(allowed)).upper()}"
+                        )
+
+                    # Non-ASCII names can lose their extension in secure_filename
+                    filename = secure_filename(event.filename)
+                    if _extension(filename) != extension:
+                        filename = f"{event.name}.{extension}"
+                    filename = _unique_filename(destination, filename, used_filenames)
+                    current = StreamedFile(
+                        event.name, event.filename, os.path.join(destination, filename)
+                    )
+                elif isinstance(event, Data) and current is not None:
+                    current.write(event.data)
+                    if not event.more_data:
+                        current.finish()
+                        files.setdefault(current.field, []).append(current)
+                        completed, current = current, None
+                        if on_file is not None:
+                            on_file(completed)
+                event = decoder.next_event()
+
+            if isinstance(event, Epilogue) or not chunk:
+                break
+    except Exception:
+        if current is not None:
+            current.discard()
+        for streamed in files.values():
+            for streamed_file in streamed:
+                if os.path.exists(streamed_file.path):
+                    os.remove(streamed_file.path)
+        raise
+
+    return files